@@ -1,6 +1,9 @@
 from django.contrib import admin
 
-from .models import IngredientType, Recipe, Tag, User
+from .models import (IngredientType, Recipe, RecipeIngredient, RecipeTag, Tag,
+                     User)
+from .utils.cart import refresh_recipe_in_carts
+from .utils.minhash import update_recipe_minhash
 
 
 @admin.register(User)
@@ -11,6 +14,8 @@ class UserAdmin(admin.ModelAdmin):
         "email",
         "first_name",
         "last_name",
+        "recipes_count",
+        "subscribers_count",
     )
     list_editable = (
         "first_name",
@@ -20,6 +25,10 @@ class UserAdmin(admin.ModelAdmin):
         "username",
         "email",
     )
+    readonly_fields = (
+        "recipes_count",
+        "subscribers_count",
+    )
 
 
 @admin.register(IngredientType)
@@ -34,6 +43,7 @@ class IngredientTypeAdmin(admin.ModelAdmin):
         "measurement_unit",
     )
     list_filter = ("name",)
+    search_fields = ("name",)
 
 
 @admin.register(Tag)
@@ -55,8 +65,28 @@ class TagAdmin(admin.ModelAdmin):
     )
 
 
+class RecipeTagInline(admin.TabularInline):
+    """
+    Тэги рецепта: у Recipe.tags явная промежуточная модель,
+    поэтому в форме рецепта они редактируются отдельно.
+    """
+    model = RecipeTag
+    extra = 1
+
+
+class RecipeIngredientInline(admin.TabularInline):
+    """
+    Ингредиенты рецепта с количеством (промежуточная модель
+    RecipeIngredient поля Recipe.ingredients).
+    """
+    model = RecipeIngredient
+    extra = 1
+    autocomplete_fields = ("ingredient_type",)
+
+
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
+    inlines = (RecipeIngredientInline, RecipeTagInline)
     list_display = (
         "id",
         "name",
@@ -65,6 +95,7 @@ class RecipeAdmin(admin.ModelAdmin):
         "image",
         "author",
         "favorites_count",
+        "ingredients_count",
     )
     list_editable = (
         "name",
@@ -72,3 +103,24 @@ class RecipeAdmin(admin.ModelAdmin):
         "image",
     )
     list_filter = ("name", "author", "tags")
+    readonly_fields = ("favorites_count", "ingredients_count")
+
+    def save_related(self, request, form, formsets, change):
+        """
+        После сохранения ингредиентов пересчитываем то же, что
+        и сериализатор рецепта: количество ингредиентов, MinHash
+        сигнатуру и итоговые корзины пользователей с этим рецептом.
+        """
+        super().save_related(request, form, formsets, change)
+        recipe = form.instance
+        ingredient_ids = list(
+            recipe.recipe_ingredients.values_list(
+                "ingredient_type_id", flat=True
+            )
+        )
+        recipe.ingredients_count = len(ingredient_ids)
+        Recipe.objects.filter(id=recipe.id).update(
+            ingredients_count=recipe.ingredients_count
+        )
+        update_recipe_minhash(recipe.id, ingredient_ids)
+        refresh_recipe_in_carts(recipe.id)
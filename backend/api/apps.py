@@ -1,7 +1,20 @@
 from django.apps import AppConfig
-from django.db.models.signals import post_delete
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
 
-from .utils.signals import delete_recipe
+from .utils.autocomplete import ingredient_index
+from .utils.signals import (decrease_favorites_count, decrease_recipes_count,
+                            decrease_subscribers_count, delete_recipe,
+                            delete_recipe_from_carts,
+                            delete_recipe_search_index, fan_out_new_recipe,
+                            increase_recipes_count, increase_subscribers_count,
+                            invalidate_page_counts,
+                            invalidate_user_page_counts,
+                            invalidate_viewer_page_counts,
+                            move_recipes_count_to_default_user,
+                            record_cart_activity, record_favorite_activity,
+                            update_cart_items, update_favorites_count,
+                            update_recipe_search_index)
 
 
 class ApiConfig(AppConfig):
@@ -14,3 +27,94 @@ class ApiConfig(AppConfig):
         post_delete.connect(
             receiver=delete_recipe, sender=self.get_model("recipe")
         )
+        # поддерживаем счетчик рецептов автора
+        post_save.connect(
+            receiver=increase_recipes_count, sender=self.get_model("recipe")
+        )
+        post_delete.connect(
+            receiver=decrease_recipes_count, sender=self.get_model("recipe")
+        )
+        # поддерживаем счетчик добавлений рецепта в избранное
+        m2m_changed.connect(
+            receiver=update_favorites_count,
+            sender=self.get_model("recipe").favorited_by.through,
+        )
+        pre_delete.connect(
+            receiver=decrease_favorites_count, sender=self.get_model("user")
+        )
+        # поддерживаем счетчик подписчиков автора
+        post_save.connect(
+            receiver=increase_subscribers_count,
+            sender=self.get_model("subscription"),
+        )
+        post_delete.connect(
+            receiver=decrease_subscribers_count,
+            sender=self.get_model("subscription"),
+        )
+        # рецепты удаляемого автора переходят пользователю по умолчанию
+        pre_delete.connect(
+            receiver=move_recipes_count_to_default_user,
+            sender=self.get_model("user"),
+        )
+        # записываем события для рейтинга популярности
+        m2m_changed.connect(
+            receiver=record_favorite_activity,
+            sender=self.get_model("recipe").favorited_by.through,
+        )
+        m2m_changed.connect(
+            receiver=record_cart_activity,
+            sender=self.get_model("recipe").added_to_cart.through,
+        )
+        # поддерживаем итоговые корзины пользователей
+        m2m_changed.connect(
+            receiver=update_cart_items,
+            sender=self.get_model("recipe").added_to_cart.through,
+        )
+        pre_delete.connect(
+            receiver=delete_recipe_from_carts, sender=self.get_model("recipe")
+        )
+        # раскладываем новые рецепты по лентам подписчиков
+        post_save.connect(
+            receiver=fan_out_new_recipe, sender=self.get_model("recipe")
+        )
+        # поддерживаем полнотекстовый индекс рецептов (SQLite)
+        post_save.connect(
+            receiver=update_recipe_search_index,
+            sender=self.get_model("recipe"),
+        )
+        post_delete.connect(
+            receiver=delete_recipe_search_index,
+            sender=self.get_model("recipe"),
+        )
+        # сбрасываем закешированные количества объектов для пагинации
+        for model_name in ("recipe", "subscription"):
+            post_save.connect(
+                receiver=invalidate_page_counts,
+                sender=self.get_model(model_name),
+            )
+        for model_name in ("recipe", "user", "subscription"):
+            post_delete.connect(
+                receiver=invalidate_page_counts,
+                sender=self.get_model(model_name),
+            )
+        post_save.connect(
+            receiver=invalidate_user_page_counts,
+            sender=self.get_model("user"),
+        )
+        # перестраиваем индекс автодополнения ингредиентов
+        post_save.connect(
+            receiver=ingredient_index.invalidate,
+            sender=self.get_model("ingredienttype"),
+        )
+        post_delete.connect(
+            receiver=ingredient_index.invalidate,
+            sender=self.get_model("ingredienttype"),
+        )
+        recipe = self.get_model("recipe")
+        m2m_changed.connect(
+            receiver=invalidate_page_counts, sender=recipe.tags.through
+        )
+        for field in (recipe.favorited_by, recipe.added_to_cart):
+            m2m_changed.connect(
+                receiver=invalidate_viewer_page_counts, sender=field.through
+            )
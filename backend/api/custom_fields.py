@@ -29,7 +29,7 @@ class Base64ImageField(ImageField):
 class IngredientTypeField(RelatedField):
     """
     Поле для вывода названия ингредиента модели IgredientType
-    в результат сериализации модели Ingredient.
+    в результат сериализации модели RecipeIngredient.
     """
 
     def to_representation(self, value):
@@ -39,7 +39,7 @@ class IngredientTypeField(RelatedField):
 class IngredientUnitField(RelatedField):
     """
     Поле для вывода названия ингредиента модели IgredientType
-    в результат сериализации модели Ingredient.
+    в результат сериализации модели RecipeIngredient.
     """
 
     def to_representation(self, value):
@@ -49,7 +49,7 @@ class IngredientUnitField(RelatedField):
 class IngredientIdField(RelatedField):
     """
     Поле для вывода id ингредиента модели IgredientType
-    в результат сериализации модели Ingredient.
+    в результат сериализации модели RecipeIngredient.
     """
 
     def to_representation(self, value):
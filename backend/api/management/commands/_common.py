@@ -13,7 +13,7 @@ def _get_model(attr: str):
         "tags": apps.get_model("api", "tag"),
         "favorited_by": apps.get_model("api", "user"),
         "added_to_cart": apps.get_model("api", "user"),
-        "ingredients": apps.get_model("api", "ingredient"),
+        "ingredients": apps.get_model("api", "recipeingredient"),
     }
     return models.get(attr)
 
@@ -41,11 +41,14 @@ def populate_recipes(file_name: str):
                 if header == "ingredients":
                     ingr_ids = values[::2]
                     amounts = values[1::2]
-                    for ingr_id, amount in zip(ingr_ids, amounts):
-                        instance, _ = model.objects.get_or_create(
-                            ingredient_id=ingr_id, amount=amount
+                    model.objects.bulk_create(
+                        model(
+                            recipe=recipe,
+                            ingredient_type_id=ingr_id,
+                            amount=amount,
                         )
-                        attr.add(instance)
+                        for ingr_id, amount in zip(ingr_ids, amounts)
+                    )
                 else:
                     for value in values:
                         attr.add(model.objects.get(id=value))
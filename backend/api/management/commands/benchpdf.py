@@ -0,0 +1,57 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from ...utils.cart import SHOPPING_LIST_TEMPLATE
+from ...utils.pdf_generator import RENDERERS
+
+
+def shopping_list(size):
+    return {
+        "username": "benchmark",
+        "list": {
+            f"Ингредиент номер {number}": f"{number * 10} г"
+            for number in range(size)
+        },
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнить время и пиковую память рендера PDF списка покупок "
+        "разными способами (без кеша готовых PDF)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", nargs="+", type=int, default=[10, 100, 1000],
+            help="Число строк в списке покупок.",
+        )
+        parser.add_argument(
+            "--repeat", type=int, default=5,
+            help="Сколько раз рендерить каждый список.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{'способ':<8}{'строк':>7}{'мс':>10}{'пик, КиБ':>12}"
+            f"{'размер, КиБ':>14}"
+        )
+        for renderer, render in RENDERERS.items():
+            # первый вызов загружает шаблон и шрифты
+            render(shopping_list(1), SHOPPING_LIST_TEMPLATE)
+            for size in options["sizes"]:
+                context = shopping_list(size)
+                started = time.perf_counter()
+                for _ in range(options["repeat"]):
+                    content = render(context, SHOPPING_LIST_TEMPLATE)
+                elapsed = (time.perf_counter() - started) / options["repeat"]
+                tracemalloc.start()
+                render(context, SHOPPING_LIST_TEMPLATE)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                self.stdout.write(
+                    f"{renderer:<8}{size:>7}{elapsed * 1000:>10.1f}"
+                    f"{peak / 1024:>12.0f}{len(content) / 1024:>14.1f}"
+                )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from ...utils.exports import fail_stale_exports
+
+
+class Command(BaseCommand):
+    help = (
+        "Пометить ошибочными выгрузки списка покупок, не сформированные "
+        "за EXPORT_TIMEOUT секунд (например, после перезапуска gunicorn). "
+        "Рассчитана на запуск по расписанию (cron)."
+    )
+
+    def handle(self, *args, **options):
+        count = fail_stale_exports()
+        self.stdout.write(
+            self.style.SUCCESS(f"Зависших выгрузок помечено: {count}.")
+        )
@@ -3,6 +3,12 @@ import csv
 from django.apps import apps
 from django.core.management.base import BaseCommand
 
+from ...utils.cart import rebuild_cart_items
+from ...utils.counters import rebuild_counters
+from ...utils.feed import rebuild_feed
+from ...utils.minhash import rebuild_minhash_index
+from ...utils.popularity import seed_popularity
+from ...utils.search import rebuild_search_fields
 from ._common import MODELS, PATH, populate_recipes
 
 
@@ -73,3 +79,12 @@ class Command(BaseCommand):
         self.populate_db()
         self.set_users_password()
         self.add_attrs_to_recipes()
+        # bulk_create и add() в обход сигналов, save() и сериализаторов
+        # не обновляют счетчики, поля поиска, индекс похожих рецептов,
+        # рейтинг популярности, ленты подписчиков и итоговые корзины
+        rebuild_counters(apps)
+        rebuild_search_fields(apps)
+        rebuild_minhash_index(apps)
+        seed_popularity(apps)
+        rebuild_feed(apps)
+        rebuild_cart_items(apps)
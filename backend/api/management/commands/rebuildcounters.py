@@ -0,0 +1,15 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from ...utils.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитать счетчики избранного, рецептов и подписчиков "
+        "по данным БД."
+    )
+
+    def handle(self, *args, **options):
+        rebuild_counters(apps)
+        self.stdout.write(self.style.SUCCESS("Счетчики успешно пересчитаны!"))
@@ -0,0 +1,17 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from ...utils.minhash import rebuild_minhash_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитать MinHash сигнатуры и LSH корзины рецептов "
+        "для поиска похожих рецептов."
+    )
+
+    def handle(self, *args, **options):
+        rebuild_minhash_index(apps)
+        self.stdout.write(
+            self.style.SUCCESS("Индекс похожих рецептов успешно пересчитан!")
+        )
@@ -0,0 +1,19 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from ...utils.popularity import update_popularity
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитать рейтинг популярных рецептов по новым событиям "
+        "избранного и корзины. Рассчитана на запуск по расписанию (cron)."
+    )
+
+    def handle(self, *args, **options):
+        count = update_popularity(apps)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Рейтинг популярности пересчитан, учтено событий: {count}."
+            )
+        )
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+from api.utils.migrations import (move_ingredients_from_recipes,
+                                  move_ingredients_to_recipes)
+
+
+class Migration(migrations.Migration):
+    """
+    Перенести количества ингредиентов из общей модели Ingredient
+    в модель RecipeIngredient. Отдельная миграция, чтобы на postgres
+    данные и схема не менялись в одной транзакции.
+    """
+
+    dependencies = [
+        ("api", "0008_recipeingredient"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            move_ingredients_to_recipes,
+            move_ingredients_from_recipes,
+        )
+    ]
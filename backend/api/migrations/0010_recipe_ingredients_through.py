@@ -0,0 +1,34 @@
+# Generated by Django 3.2.9 on 2026-10-18 19:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Поле Recipe.ingredients нельзя перевести на through-модель
+    через AlterField, поэтому пересоздаем его.
+    """
+
+    dependencies = [
+        ("api", "0009_move_ingredients_to_recipes"),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name="recipe",
+            name="ingredients",
+        ),
+        migrations.DeleteModel(
+            name="Ingredient",
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="ingredients",
+            field=models.ManyToManyField(
+                related_name="recipes",
+                through="api.RecipeIngredient",
+                to="api.IngredientType",
+                verbose_name="Ингредиенты",
+            ),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.2.9 on 2026-10-18 20:05
+
+from django.db import migrations, models
+
+from api.utils.migrations import rebuild_counters_from_migration
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0010_recipe_ingredients_through"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="favorites_count",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Количество добавлений в избранное"
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="recipes_count",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Количество рецептов"
+            ),
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="subscribers_count",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Количество подписчиков"
+            ),
+        ),
+        migrations.RunPython(
+            rebuild_counters_from_migration, migrations.RunPython.noop
+        ),
+    ]
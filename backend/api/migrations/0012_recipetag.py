@@ -0,0 +1,87 @@
+# Generated by Django 3.2.9 on 2026-10-18 20:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Объявить таблицу поля Recipe.tags явной through-моделью RecipeTag.
+    Таблица api_recipe_tags уже существует (id в ней - integer),
+    поэтому меняем только состояние миграций, а в БД добавляем
+    составной индекс (tag, recipe) и удаляем ставший лишним
+    индекс по tag_id.
+    """
+
+    dependencies = [
+        ("api", "0011_counters"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name="RecipeTag",
+                    fields=[
+                        (
+                            "id",
+                            models.AutoField(
+                                primary_key=True, serialize=False
+                            ),
+                        ),
+                        (
+                            "recipe",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                related_name="recipe_tags",
+                                to="api.recipe",
+                                verbose_name="Рецепт",
+                            ),
+                        ),
+                        (
+                            "tag",
+                            models.ForeignKey(
+                                on_delete=django.db.models.deletion.CASCADE,
+                                related_name="recipe_tags",
+                                to="api.tag",
+                                verbose_name="Тэг",
+                            ),
+                        ),
+                    ],
+                    options={
+                        "verbose_name": "Тэг рецепта",
+                        "verbose_name_plural": "Тэги рецептов",
+                        "db_table": "api_recipe_tags",
+                        "unique_together": {("recipe", "tag")},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name="recipe",
+                    name="tags",
+                    field=models.ManyToManyField(
+                        related_name="recipes",
+                        through="api.RecipeTag",
+                        to="api.Tag",
+                        verbose_name="Тэги",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="recipetag",
+            name="tag",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="recipe_tags",
+                to="api.tag",
+                verbose_name="Тэг",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipetag",
+            index=models.Index(
+                fields=["tag", "recipe"], name="recipe_tag_tag_recipe_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 3.2.9 on 2026-10-18 21:10
+
+from django.db import migrations
+
+from api.utils.migrations import create_trigram_index, drop_trigram_index
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0012_recipetag"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
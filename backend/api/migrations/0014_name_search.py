@@ -0,0 +1,48 @@
+# Generated by Django 3.2.9 on 2026-10-18 21:40
+
+from django.db import migrations, models
+
+from api.utils.migrations import (create_name_search_trigram_indexes,
+                                  create_trigram_index,
+                                  drop_name_search_trigram_indexes,
+                                  drop_trigram_index,
+                                  rebuild_search_fields_from_migration)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0013_ingredient_type_trigram_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="ingredienttype",
+            name="name_search",
+            field=models.CharField(
+                default="",
+                editable=False,
+                max_length=128,
+                verbose_name="Название для поиска",
+            ),
+        ),
+        migrations.AddField(
+            model_name="recipe",
+            name="name_search",
+            field=models.CharField(
+                default="",
+                editable=False,
+                max_length=200,
+                verbose_name="Название для поиска",
+            ),
+        ),
+        migrations.RunPython(
+            rebuild_search_fields_from_migration, migrations.RunPython.noop
+        ),
+        # нечеткий поиск ингредиентов переходит с name на name_search
+        migrations.RunPython(drop_trigram_index, create_trigram_index),
+        migrations.RunPython(
+            create_name_search_trigram_indexes,
+            drop_name_search_trigram_indexes,
+        ),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 3.2.9 on 2026-10-18 22:20
+
+from django.db import migrations
+
+from api.utils.migrations import create_full_text_index, drop_full_text_index
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0014_name_search"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_full_text_index, drop_full_text_index),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.9 on 2026-10-18 23:00
+
+from django.db import migrations, models
+
+from api.utils.migrations import rebuild_counters_from_migration
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0015_recipe_full_text_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="recipe",
+            name="ingredients_count",
+            field=models.PositiveSmallIntegerField(
+                default=0, verbose_name="Количество ингредиентов"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipeingredient",
+            index=models.Index(
+                fields=["ingredient_type", "recipe"],
+                name="recipe_ingredient_type_idx",
+            ),
+        ),
+        migrations.RunPython(
+            rebuild_counters_from_migration, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 3.2.9 on 2026-10-18 23:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from api.utils.migrations import rebuild_minhash_index_from_migration
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0016_recipe_ingredients_count"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeSignature",
+            fields=[
+                (
+                    "recipe",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="signature",
+                        serialize=False,
+                        to="api.recipe",
+                        verbose_name="Рецепт",
+                    ),
+                ),
+                ("minhash", models.BinaryField(verbose_name="Сигнатура")),
+            ],
+            options={
+                "verbose_name": "Сигнатура рецепта",
+                "verbose_name_plural": "Сигнатуры рецептов",
+            },
+        ),
+        migrations.CreateModel(
+            name="RecipeBucket",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("bucket", models.BigIntegerField(verbose_name="Корзина")),
+                (
+                    "recipe",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="lsh_buckets",
+                        to="api.recipe",
+                        verbose_name="Рецепт",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "LSH корзина рецепта",
+                "verbose_name_plural": "LSH корзины рецептов",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="recipebucket",
+            index=models.Index(
+                fields=["bucket", "recipe"], name="recipe_bucket_idx"
+            ),
+        ),
+        migrations.RunPython(
+            rebuild_minhash_index_from_migration, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 3.2.9 on 2026-10-19 00:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from api.utils.migrations import seed_popularity_from_migration
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0017_recipe_minhash"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeActivity",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("favorite", "Добавление в избранное"),
+                            ("shopping_cart", "Добавление в корзину"),
+                        ],
+                        max_length=16,
+                        verbose_name="Событие",
+                    ),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Время"
+                    ),
+                ),
+                (
+                    "recipe",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="activity",
+                        to="api.recipe",
+                        verbose_name="Рецепт",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="recipe_activity",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Событие рецепта",
+                "verbose_name_plural": "События рецептов",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="recipeactivity",
+            constraint=models.UniqueConstraint(
+                fields=("user", "recipe", "kind"),
+                name="unique_recipe_activity",
+            ),
+        ),
+        migrations.CreateModel(
+            name="RecipePopularity",
+            fields=[
+                (
+                    "recipe",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="popularity",
+                        serialize=False,
+                        to="api.recipe",
+                        verbose_name="Рецепт",
+                    ),
+                ),
+                ("score", models.FloatField(verbose_name="Популярность")),
+                (
+                    "updated",
+                    models.DateTimeField(verbose_name="Пересчитана"),
+                ),
+            ],
+            options={
+                "verbose_name": "Популярность рецепта",
+                "verbose_name_plural": "Популярность рецептов",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="recipepopularity",
+            index=models.Index(
+                fields=["-score", "-recipe"], name="recipe_popularity_idx"
+            ),
+        ),
+        migrations.RunPython(
+            seed_popularity_from_migration, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 3.2.9 on 2026-10-19 01:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from api.utils.migrations import rebuild_cart_items_from_migration
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0019_feedentry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CartItem",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("total", models.PositiveIntegerField(verbose_name="Количество")),
+                (
+                    "ingredient_type",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="cart_items",
+                        to="api.ingredienttype",
+                        verbose_name="Ингредиент",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="cart_items",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Пользователь",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Ингредиент корзины",
+                "verbose_name_plural": "Ингредиенты корзины",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="cartitem",
+            constraint=models.UniqueConstraint(
+                fields=("user", "ingredient_type"), name="unique_cart_item"
+            ),
+        ),
+        migrations.RunPython(
+            rebuild_cart_items_from_migration, migrations.RunPython.noop
+        ),
+    ]
@@ -1,10 +1,15 @@
-from django.db.models import Sum
+from django.http import StreamingHttpResponse
 from rest_framework import permissions, status
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
+from .renderers import (PDFRenderer, ShoppingListCSVRenderer,
+                        ShoppingListJSONRenderer, ShoppingListStreamRenderer,
+                        ShoppingListTextRenderer)
 from .serializers import RecipeBaseSerializer
+from .utils.cart import (SHOPPING_LIST_TEMPLATE, shopping_list_context,
+                         shopping_list_rows)
 from .utils.pdf_generator import render_pdf
 
 
@@ -76,24 +81,36 @@ class FavoritesShoppingCartMixin:
     @action(
         methods=["get"],
         detail=False,
-        permission_classes=(permissions.IsAuthenticated,)
+        permission_classes=(permissions.IsAuthenticated,),
+        renderer_classes=(
+            PDFRenderer,
+            ShoppingListTextRenderer,
+            ShoppingListCSVRenderer,
+            ShoppingListJSONRenderer,
+        ),
     )
     def download_shopping_cart(self, *args, **kwargs):
-        user = self.request.user
-        recipes = user.shopping_cart
-        shopping_cart = (
-            recipes.values(
-                "ingredients__ingredient__name",
-                "ingredients__ingredient__measurement_unit",
-            )
-            .order_by("ingredients__ingredient__name")
-            .annotate(total=Sum("ingredients__amount"))
-        )
-        shopping_dict = {}
-        for item in shopping_cart:
-            ingredient, unit, amount = item.values()
-            shopping_dict.update({ingredient: str(amount) + " " + unit})
+        """
+        Список покупок читается из итоговой корзины пользователя
+        (CartItem) одним запросом, без суммирования по рецептам.
+        Формат выбирается параметром `?format=pdf|txt|csv|json`
+        или заголовком Accept, по умолчанию PDF.
+        Текстовые форматы отдаются потоком по мере чтения корзины,
+        без шаблона и PDF.
+        """
         request = self.request
-        data = {"username": user.username, "list": shopping_dict}
-        template = "shopping_list.html"
-        return render_pdf(request, data, template)
+        user = request.user
+        renderer = request.accepted_renderer
+        if isinstance(renderer, ShoppingListStreamRenderer):
+            response = StreamingHttpResponse(
+                renderer.stream(user.username, shopping_list_rows(user)),
+                content_type=f"{renderer.media_type}; "
+                             f"charset={renderer.charset}",
+            )
+            response["Content-Disposition"] = (
+                f'attachment; filename="shopping_list_{user}.'
+                f'{renderer.extension}"'
+            )
+            return response
+        data = shopping_list_context(user)
+        return render_pdf(request, data, SHOPPING_LIST_TEMPLATE)
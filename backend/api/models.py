@@ -1,8 +1,12 @@
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.db.models import (Count, Exists, F, FloatField, OuterRef, Prefetch,
+                              Window)
+from django.db.models.functions import Cast, NullIf, RowNumber
 from django.utils.translation import gettext_lazy as _
 
+from .utils.search import normalize
 from .utils.validators import model_hex_validator
 
 
@@ -15,6 +19,12 @@ class User(AbstractUser):
     password = models.CharField(_("password"), max_length=128)
     first_name = models.CharField(_("first name"), max_length=150)
     last_name = models.CharField(_("last name"), max_length=150)
+    recipes_count = models.PositiveIntegerField(
+        default=0, verbose_name="Количество рецептов"
+    )
+    subscribers_count = models.PositiveIntegerField(
+        default=0, verbose_name="Количество подписчиков"
+    )
 
     @staticmethod
     def get_default_user():
@@ -22,8 +32,28 @@ class User(AbstractUser):
         return deleted.pk
 
 
-class IngredientType(models.Model):
+class SearchNameMixin:
+    """
+    Поддерживает нормализованную копию названия (name_search)
+    для поиска без учета регистра и различия "ё" и "е".
+    """
+
+    def save(self, *args, **kwargs):
+        self.name_search = normalize(self.name)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "name" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "name_search"}
+        super().save(*args, **kwargs)
+
+
+class IngredientType(SearchNameMixin, models.Model):
     name = models.CharField(max_length=128, verbose_name="Название")
+    name_search = models.CharField(
+        max_length=128,
+        default="",
+        editable=False,
+        verbose_name="Название для поиска",
+    )
     measurement_unit = models.CharField(
         max_length=32, verbose_name="Единица измерения"
     )
@@ -42,28 +72,6 @@ class IngredientType(models.Model):
         return f"{self.name}, {self.measurement_unit}"
 
 
-class Ingredient(models.Model):
-    ingredient = models.ForeignKey(
-        IngredientType,
-        related_name="recipe_amount",
-        on_delete=models.CASCADE,
-        verbose_name="Ингредиент",
-    )
-    amount = models.PositiveSmallIntegerField(
-        verbose_name="Количество",
-        validators=[
-            MinValueValidator(1),
-            MaxValueValidator(10000),
-        ],
-    )
-
-    def __str__(self):
-        return (
-            f"{self.ingredient.name}: {self.amount} "
-            f"{self.ingredient.measurement_unit}"
-        )
-
-
 class Tag(models.Model):
     name = models.CharField(
         max_length=32,
@@ -83,8 +91,114 @@ class Tag(models.Model):
         return f"{self.slug}, цвет {self.color}"
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    def with_related(self):
+        """
+        Подтянуть автора, тэги и ингредиенты с их типами
+        фиксированным числом запросов, независимо от размера выборки.
+        """
+        return self.select_related("author").prefetch_related(
+            "tags",
+            Prefetch(
+                "recipe_ingredients",
+                queryset=RecipeIngredient.objects.select_related(
+                    "ingredient_type"
+                ),
+            ),
+        )
+
+    def latest_by_author(self, author_ids, limit):
+        """
+        Последние `limit` рецептов каждого автора из author_ids
+        одним запросом: рецепты нумеруются оконной функцией ROW_NUMBER
+        в разрезе автора, лишние отсекаются по номеру.
+        Возвращаем словарь {id автора: [рецепты]}.
+        """
+        result = {author_id: [] for author_id in author_ids}
+        if not result:
+            return result
+        ranked = (
+            self.filter(author_id__in=result)
+            .annotate(
+                author_rank=Window(
+                    expression=RowNumber(),
+                    partition_by=[F("author_id")],
+                    order_by=F("id").desc(),
+                )
+            )
+            .order_by()
+        )
+        sql, params = ranked.query.sql_with_params()
+        recipes = self.model.objects.raw(
+            f"SELECT * FROM ({sql}) ranked "
+            "WHERE author_rank <= %s ORDER BY author_rank",
+            (*params, limit),
+        )
+        for recipe in recipes:
+            result[recipe.author_id].append(recipe)
+        return result
+
+    def cookable_from(self, ingredient_ids, exclude_ids=()):
+        """
+        Рецепты, в которых есть хотя бы один из ингредиентов
+        ingredient_ids и нет ни одного из exclude_ids.
+        Рецепты отбираются по индексу (тип ингредиента, рецепт) таблицы
+        RecipeIngredient, без просмотра состава каждого рецепта.
+        Сортировка - по доле имеющихся ингредиентов в рецепте (coverage),
+        затем по их количеству (matched_count). Рецепты с еще
+        не посчитанным ingredients_count (0) идут последними.
+        """
+        queryset = self.filter(
+            recipe_ingredients__ingredient_type_id__in=ingredient_ids
+        )
+        if exclude_ids:
+            queryset = queryset.filter(
+                ~Exists(
+                    RecipeIngredient.objects.filter(
+                        recipe_id=OuterRef("pk"),
+                        ingredient_type_id__in=exclude_ids,
+                    )
+                )
+            )
+        return (
+            queryset.annotate(matched_count=Count("recipe_ingredients"))
+            .annotate(
+                coverage=Cast("matched_count", FloatField())
+                / NullIf(Cast("ingredients_count", FloatField()), 0.0)
+            )
+            .order_by(
+                F("coverage").desc(nulls_last=True), "-matched_count", "-id"
+            )
+        )
+
+    def with_user_flags(self, user):
+        """
+        Аннотировать рецепты флагами `is_favorited` и `is_in_shopping_cart`
+        для пользователя user. Оба флага вычисляются подзапросами EXISTS
+        в том же запросе, что и сами рецепты.
+        """
+        if not user.is_authenticated:
+            return self
+        favorites = Recipe.favorited_by.through.objects.filter(
+            recipe_id=OuterRef("pk"), user_id=user.id
+        )
+        shopping_cart = Recipe.added_to_cart.through.objects.filter(
+            recipe_id=OuterRef("pk"), user_id=user.id
+        )
+        return self.annotate(
+            is_favorited=Exists(favorites),
+            is_in_shopping_cart=Exists(shopping_cart),
+        )
+
+
+class Recipe(SearchNameMixin, models.Model):
     name = models.CharField(max_length=200, verbose_name="Название")
+    name_search = models.CharField(
+        max_length=200,
+        default="",
+        editable=False,
+        verbose_name="Название для поиска",
+    )
     text = models.TextField(max_length=4000, verbose_name="Описание")
     cooking_time = models.PositiveSmallIntegerField(
         validators=[MinValueValidator(1), MaxValueValidator(360)],
@@ -109,22 +223,32 @@ class Recipe(models.Model):
         related_name="favorites",
         verbose_name="Избранное",
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0, verbose_name="Количество добавлений в избранное"
+    )
     added_to_cart = models.ManyToManyField(
         User,
         related_name="shopping_cart",
         verbose_name="Корзина",
     )
     ingredients = models.ManyToManyField(
-        Ingredient,
+        IngredientType,
+        through="RecipeIngredient",
         related_name="recipes",
         verbose_name="Ингредиенты",
     )
+    ingredients_count = models.PositiveSmallIntegerField(
+        default=0, verbose_name="Количество ингредиентов"
+    )
     tags = models.ManyToManyField(
         Tag,
+        through="RecipeTag",
         related_name="recipes",
         verbose_name="Тэги",
     )
 
+    objects = RecipeQuerySet.as_manager()
+
     class Meta:
         ordering = ("-id",)
         verbose_name = "Рецепт"
@@ -133,10 +257,219 @@ class Recipe(models.Model):
     def __str__(self):
         return f"{self.name} от {self.author}"
 
-    def favorites_count(self):
-        return self.favorited_by.count()
 
-    favorites_count.short_description = "Количество добавлений в избранное"
+class RecipeIngredient(models.Model):
+    """
+    Количество ингредиента (IngredientType) в конкретном рецепте.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe,
+        related_name="recipe_ingredients",
+        on_delete=models.CASCADE,
+        verbose_name="Рецепт",
+    )
+    ingredient_type = models.ForeignKey(
+        IngredientType,
+        related_name="recipe_ingredients",
+        on_delete=models.CASCADE,
+        verbose_name="Ингредиент",
+    )
+    amount = models.PositiveSmallIntegerField(
+        verbose_name="Количество",
+        validators=[
+            MinValueValidator(1),
+            MaxValueValidator(10000),
+        ],
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "ingredient_type"],
+                name="unique_recipe_ingredient",
+            )
+        ]
+        indexes = [
+            # рецепты по типу ингредиента для поиска по имеющимся продуктам
+            models.Index(
+                fields=["ingredient_type", "recipe"],
+                name="recipe_ingredient_type_idx",
+            )
+        ]
+        verbose_name = "Ингредиент рецепта"
+        verbose_name_plural = "Ингредиенты рецептов"
+
+    def __str__(self):
+        return (
+            f"{self.ingredient_type.name}: {self.amount} "
+            f"{self.ingredient_type.measurement_unit}"
+        )
+
+
+class RecipeTag(models.Model):
+    """
+    Связь рецепта с тэгом (таблица поля Recipe.tags).
+    Объявлена явно ради составного индекса (tag, recipe),
+    по которому рецепты отбираются при фильтрации по тэгам.
+    Он же заменяет отдельный индекс по tag_id.
+    """
+
+    # id таблицы, созданной для Recipe.tags до DEFAULT_AUTO_FIELD
+    id = models.AutoField(primary_key=True)
+    recipe = models.ForeignKey(
+        Recipe,
+        related_name="recipe_tags",
+        on_delete=models.CASCADE,
+        verbose_name="Рецепт",
+    )
+    tag = models.ForeignKey(
+        Tag,
+        related_name="recipe_tags",
+        on_delete=models.CASCADE,
+        db_index=False,
+        verbose_name="Тэг",
+    )
+
+    class Meta:
+        db_table = "api_recipe_tags"
+        unique_together = (("recipe", "tag"),)
+        indexes = [
+            models.Index(
+                fields=["tag", "recipe"], name="recipe_tag_tag_recipe_idx"
+            )
+        ]
+        verbose_name = "Тэг рецепта"
+        verbose_name_plural = "Тэги рецептов"
+
+    def __str__(self):
+        return f"{self.recipe_id}: {self.tag_id}"
+
+
+class RecipeSignature(models.Model):
+    """
+    MinHash сигнатура множества типов ингредиентов рецепта
+    (см. utils/minhash.py) для поиска похожих рецептов.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        primary_key=True,
+        related_name="signature",
+        on_delete=models.CASCADE,
+        verbose_name="Рецепт",
+    )
+    minhash = models.BinaryField(verbose_name="Сигнатура")
+
+    class Meta:
+        verbose_name = "Сигнатура рецепта"
+        verbose_name_plural = "Сигнатуры рецептов"
+
+    def __str__(self):
+        return f"{self.recipe_id}"
+
+
+class RecipeBucket(models.Model):
+    """
+    LSH корзина рецепта: рецепты с общей корзиной - кандидаты в похожие.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe,
+        related_name="lsh_buckets",
+        on_delete=models.CASCADE,
+        verbose_name="Рецепт",
+    )
+    bucket = models.BigIntegerField(verbose_name="Корзина")
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["bucket", "recipe"], name="recipe_bucket_idx"
+            )
+        ]
+        verbose_name = "LSH корзина рецепта"
+        verbose_name_plural = "LSH корзины рецептов"
+
+    def __str__(self):
+        return f"{self.recipe_id}: {self.bucket}"
+
+
+class RecipeActivity(models.Model):
+    """
+    Событие интереса к рецепту (добавление в избранное или корзину).
+    Очередь для пересчета популярности (utils/popularity.py):
+    учтенные события удаляются. Пока событие в очереди, повторное
+    добавление тем же пользователем не записывается, поэтому
+    от пользователя учитывается не больше одного события
+    каждого вида за пересчет.
+    """
+
+    FAVORITE = "favorite"
+    SHOPPING_CART = "shopping_cart"
+    KIND_CHOICES = (
+        (FAVORITE, "Добавление в избранное"),
+        (SHOPPING_CART, "Добавление в корзину"),
+    )
+
+    recipe = models.ForeignKey(
+        Recipe,
+        related_name="activity",
+        on_delete=models.CASCADE,
+        verbose_name="Рецепт",
+    )
+    user = models.ForeignKey(
+        User,
+        related_name="recipe_activity",
+        on_delete=models.CASCADE,
+        verbose_name="Пользователь",
+    )
+    kind = models.CharField(
+        max_length=16, choices=KIND_CHOICES, verbose_name="Событие"
+    )
+    created = models.DateTimeField(auto_now_add=True, verbose_name="Время")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "recipe", "kind"],
+                name="unique_recipe_activity",
+            )
+        ]
+        verbose_name = "Событие рецепта"
+        verbose_name_plural = "События рецептов"
+
+    def __str__(self):
+        return f"{self.recipe_id}: {self.kind} {self.created}"
+
+
+class RecipePopularity(models.Model):
+    """
+    Популярность рецепта: затухающая со временем сумма весов событий
+    RecipeActivity на момент updated.
+    """
+
+    recipe = models.OneToOneField(
+        Recipe,
+        primary_key=True,
+        related_name="popularity",
+        on_delete=models.CASCADE,
+        verbose_name="Рецепт",
+    )
+    score = models.FloatField(verbose_name="Популярность")
+    updated = models.DateTimeField(verbose_name="Пересчитана")
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["-score", "-recipe"], name="recipe_popularity_idx"
+            )
+        ]
+        verbose_name = "Популярность рецепта"
+        verbose_name_plural = "Популярность рецептов"
+
+    def __str__(self):
+        return f"{self.recipe_id}: {self.score}"
 
 
 class Subscription(models.Model):
@@ -165,3 +498,117 @@ class Subscription(models.Model):
 
     def __str__(self):
         return f"{self.subscriber} подписался на {self.subscribed_to}"
+
+
+class FeedEntry(models.Model):
+    """
+    Запись ленты подписчика: рецепт автора, на которого он подписан.
+    Создается при публикации рецепта (fan-out on write, см. utils/feed.py).
+    """
+
+    user = models.ForeignKey(
+        User,
+        related_name="feed_entries",
+        on_delete=models.CASCADE,
+        verbose_name="Подписчик",
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        related_name="feed_entries",
+        on_delete=models.CASCADE,
+        verbose_name="Рецепт",
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "recipe"], name="unique_feed_entry"
+            )
+        ]
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Записи ленты"
+
+    def __str__(self):
+        return f"{self.user_id}: {self.recipe_id}"
+
+
+class CartItem(models.Model):
+    """
+    Итоговое количество ингредиента в корзине пользователя:
+    сумма по всем рецептам корзины. Обновляется при добавлении
+    и удалении рецептов из корзины (см. utils/cart.py).
+    """
+
+    user = models.ForeignKey(
+        User,
+        related_name="cart_items",
+        on_delete=models.CASCADE,
+        verbose_name="Пользователь",
+    )
+    ingredient_type = models.ForeignKey(
+        IngredientType,
+        related_name="cart_items",
+        on_delete=models.CASCADE,
+        verbose_name="Ингредиент",
+    )
+    total = models.PositiveIntegerField(verbose_name="Количество")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "ingredient_type"], name="unique_cart_item"
+            )
+        ]
+        verbose_name = "Ингредиент корзины"
+        verbose_name_plural = "Ингредиенты корзины"
+
+    def __str__(self):
+        return f"{self.user_id}: {self.ingredient_type_id} {self.total}"
+
+
+class ShoppingListExport(models.Model):
+    """
+    Задание на выгрузку списка покупок. PDF формируется пулом процессов
+    вне потоков запросов (см. utils/exports.py), готовый файл лежит
+    в settings.EXPORTS_ROOT и доступен любому воркеру.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (PENDING, "В очереди"),
+        (RUNNING, "Формируется"),
+        (DONE, "Готово"),
+        (FAILED, "Ошибка"),
+    )
+
+    user = models.ForeignKey(
+        User,
+        related_name="exports",
+        on_delete=models.CASCADE,
+        verbose_name="Пользователь",
+    )
+    status = models.CharField(
+        max_length=16,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        verbose_name="Статус",
+    )
+    file = models.CharField(
+        max_length=255, blank=True, verbose_name="Файл"
+    )
+    error = models.TextField(blank=True, verbose_name="Ошибка")
+    created = models.DateTimeField(auto_now_add=True, verbose_name="Создано")
+    finished = models.DateTimeField(
+        null=True, blank=True, verbose_name="Завершено"
+    )
+
+    class Meta:
+        ordering = ("-id",)
+        verbose_name = "Выгрузка списка покупок"
+        verbose_name_plural = "Выгрузки списка покупок"
+
+    def __str__(self):
+        return f"{self.user_id}: {self.status}"
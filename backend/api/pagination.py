@@ -1,11 +1,186 @@
-from rest_framework.pagination import (LimitOffsetPagination,
+import hashlib
+import json
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (CursorPagination, LimitOffsetPagination,
                                        PageNumberPagination)
+from rest_framework.utils.urls import replace_query_param
+
+CURSOR_PAGINATION_PARAM = "pagination"
+CURSOR_PAGINATION_VALUE = "cursor"
+COUNT_CACHE_VERSION_KEY = "pagination_count_version"
+
+
+def viewer_count_version_key(user_id):
+    """
+    Ключ версии закешированных количеств, зависящих от избранного
+    и корзины пользователя user_id (фильтры is_favorited
+    и is_in_shopping_cart).
+    """
+    return f"{COUNT_CACHE_VERSION_KEY}:{user_id}"
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator, который не выполняет COUNT(*) на каждый запрос.
+    Количество кешируется по тексту запроса
+    на PAGINATION_COUNT_CACHE_TIMEOUT секунд, кеш сбрасывается
+    при записи рецептов и подписок, создании и удалении пользователей
+    (см. utils.signals.invalidate_page_counts). Количества, отфильтрованные
+    по избранному или корзине зрителя viewer_id, дополнительно зависят
+    от его версии: ее меняют только его собственные изменения
+    (utils.signals.invalidate_viewer_page_counts).
+    Кеш должен быть общим для всех процессов (settings.CACHES).
+    При промахе кеша на postgres сначала спрашиваем оценку планировщика
+    (EXPLAIN): если она не меньше PAGINATION_COUNT_ESTIMATE_THRESHOLD,
+    отдаем ее вместо точного количества.
+    """
+
+    def __init__(self, *args, viewer_id=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.viewer_id = viewer_id
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return super().count
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        key = self._get_cache_key(
+            sql, params, self._is_viewer_scoped(queryset)
+        )
+        count = cache.get(key)
+        if count is None:
+            count = self._estimate_count(queryset.db, sql, params)
+            if count < settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD:
+                count = queryset.count()
+            cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+    def _estimate_count(self, using, sql, params):
+        """
+        Оценка количества строк планировщиком postgres.
+        На остальных БД оценка не поддерживается.
+        """
+        connection = connections[using]
+        if connection.vendor != "postgresql":
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0]["Plan"]["Plan Rows"]
+
+    def _is_viewer_scoped(self, queryset):
+        """
+        Отфильтрован ли запрос по избранному или корзине
+        (соединение с их таблицами).
+        """
+        if self.viewer_id is None:
+            return False
+        recipe_model = apps.get_model("api", "Recipe")
+        viewer_tables = {
+            recipe_model.favorited_by.through._meta.db_table,
+            recipe_model.added_to_cart.through._meta.db_table,
+        }
+        return any(
+            join.table_name in viewer_tables
+            for join in queryset.query.alias_map.values()
+        )
+
+    def _get_cache_key(self, sql, params, viewer_scoped=False):
+        version = cache.get(COUNT_CACHE_VERSION_KEY, 0)
+        if viewer_scoped:
+            viewer_version = cache.get(
+                viewer_count_version_key(self.viewer_id), 0
+            )
+            version = f"{version}.{self.viewer_id}.{viewer_version}"
+        digest = hashlib.md5(repr((sql, params)).encode()).hexdigest()
+        return f"pagination_count:{version}:{digest}"
 
 
 class PageLimitPagination(PageNumberPagination):
     page_size = 6
     page_size_query_param = "limit"
     max_page_size = 10
+    viewer_id = None
+
+    def django_paginator_class(self, object_list, per_page):
+        return CachedCountPaginator(
+            object_list, per_page, viewer_id=self.viewer_id
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.viewer_id = request.user.pk
+        return super().paginate_queryset(queryset, request, view)
+
+
+class RecipeCursorPagination(CursorPagination):
+    """
+    Курсорная (keyset) пагинация рецептов по id.
+    Страница выбирается условием `id < курсор` без OFFSET,
+    общее количество рецептов не считается.
+    """
+    page_size = 6
+    page_size_query_param = "limit"
+    max_page_size = 10
+    ordering = ("-id",)
+
+
+class PopularRecipesCursorPagination(RecipeCursorPagination):
+    """
+    Курсорная пагинация рейтинга популярных рецептов.
+    Рецепты должны быть аннотированы полем `popularity_score`.
+    Курсор хранит оценку последнего рецепта страницы, а при каждом
+    пересчете рейтинга (`updatepopularity`) все оценки затухают.
+    Поэтому ссылки на соседние страницы помечаются версией рейтинга
+    (параметр `ranking`), и курсор от прежнего рейтинга отклоняется:
+    листать заново нужно с первой страницы.
+    """
+    ordering = ("-popularity_score", "-id")
+    ranking_query_param = "ranking"
+    stale_cursor_message = (
+        "Рейтинг популярности обновился, начните с первой страницы."
+    )
+
+    def __init__(self, ranking_version=""):
+        self.ranking_version = ranking_version
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is not None and (
+            request.query_params.get(self.ranking_query_param)
+            != self.ranking_version
+        ):
+            raise NotFound(self.stale_cursor_message)
+        return cursor
+
+    def encode_cursor(self, cursor):
+        return replace_query_param(
+            super().encode_cursor(cursor),
+            self.ranking_query_param,
+            self.ranking_version,
+        )
+
+
+class FeedCursorPagination(RecipeCursorPagination):
+    """
+    Курсорная пагинация ленты подписок.
+    Рецепты должны быть аннотированы полем `feed_position`.
+    """
+    ordering = ("-feed_position",)
 
 
 class RecipesLimitPagination(LimitOffsetPagination):
@@ -0,0 +1,106 @@
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class PDFRenderer(BaseRenderer):
+    """
+    PDF списка покупок. Сам PDF отдает render_pdf, через рендерер
+    проходят только ошибки (например, 401) - они отдаются в JSON.
+    """
+    media_type = "application/pdf"
+    format = "pdf"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        response = (renderer_context or {}).get("response")
+        if response is not None:
+            response["Content-Type"] = "application/json"
+        return json.dumps(data, ensure_ascii=False).encode()
+
+
+class ShoppingListStreamRenderer(BaseRenderer):
+    """
+    Базовый рендерер списка покупок без шаблона и PDF:
+    stream() выдает ответ частями по мере чтения строк корзины.
+    Ошибки отдаются текстом.
+    """
+    charset = "utf-8"
+    extension = "txt"
+
+    def stream(self, username, rows):
+        """
+        Части ответа по строкам (ингредиент, единица, количество).
+        """
+        raise NotImplementedError
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if isinstance(data, dict) and "detail" in data:
+            data = data["detail"]
+        return str(data).encode(self.charset)
+
+
+class ShoppingListTextRenderer(ShoppingListStreamRenderer):
+    media_type = "text/plain"
+    format = "txt"
+
+    def stream(self, username, rows):
+        yield f"Список покупок пользователя {username}\n\n"
+        for ingredient, unit, amount in rows:
+            yield f"{ingredient} - {amount} {unit}\n"
+
+
+class _Echo:
+    """
+    Псевдофайл для csv.writer: возвращает записанную строку.
+    """
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListCSVRenderer(ShoppingListStreamRenderer):
+    media_type = "text/csv"
+    format = "csv"
+    extension = "csv"
+
+    def stream(self, username, rows):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(("Ингредиент", "Количество", "Единица"))
+        for ingredient, unit, amount in rows:
+            yield writer.writerow((ingredient, amount, unit))
+
+
+class ShoppingListJSONRenderer(ShoppingListStreamRenderer):
+    """
+    JSON собирается по строкам корзины, без сериализации
+    всего списка в памяти.
+    """
+    media_type = "application/json"
+    format = "json"
+    extension = "json"
+
+    def stream(self, username, rows):
+        yield f'{{"username": {json.dumps(username, ensure_ascii=False)}, '
+        yield '"ingredients": ['
+        separator = ""
+        for ingredient, unit, amount in rows:
+            item = {
+                "name": ingredient,
+                "measurement_unit": unit,
+                "amount": amount,
+            }
+            yield separator + json.dumps(item, ensure_ascii=False)
+            separator = ", "
+        yield "]}"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
@@ -1,10 +1,13 @@
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from rest_framework import serializers
 
 from . import models as api_models
 from .custom_fields import (Base64ImageField, IngredientIdField,
                             IngredientTypeField, IngredientUnitField)
 from .pagination import RecipesLimitPagination
+from .utils.cart import add_recipe_to_carts, remove_recipe_from_carts
+from .utils.minhash import update_recipe_minhash
 from .utils.validators import _validate_hex, _validate_password
 
 User = get_user_model()
@@ -77,20 +80,46 @@ class UserMainSerializer(BaseUserSerializer):
         Если пользователь не авторизован
         или если пользователь видит свой профиль,
         то не показываем поле `is_subscribed`.
+        Убираем поле из результата, а не из self.fields:
+        при many=True поля общие для всех пользователей в выдаче.
         """
+        representation = super().to_representation(instance)
         if (
             not self.context.get("request").user.is_authenticated
             or self.context.get("request").user.id == instance.id
         ):
-            self.fields.pop("is_subscribed", None)
-        return super().to_representation(instance)
+            representation.pop("is_subscribed", None)
+        return representation
 
     def get_is_subscribed(self, obj):
-        return (
-            self.context.get("request")
-            .user.subscriptions.filter(subscribed_to_id=obj.id)
-            .exists()
-        )
+        """
+        Берем флаг из аннотации queryset'а, если ее нет
+        (например, автор во вложенном представлении рецепта) -
+        из множества подписок текущего пользователя.
+        """
+        is_subscribed = getattr(obj, "is_subscribed", None)
+        if is_subscribed is not None:
+            return is_subscribed
+        return obj.id in self._get_subscribed_ids()
+
+    def _get_subscribed_ids(self):
+        """
+        Id авторов, на которых подписан текущий пользователь.
+        Запрашиваются один раз и хранятся в контексте,
+        общем для корневого и всех вложенных сериализаторов.
+        """
+        if "subscribed_ids" not in self.context:
+            user = self.context.get("request").user
+            self.context["subscribed_ids"] = (
+                set(
+                    user.subscriptions.values_list(
+                        "subscribed_to_id", flat=True
+                    )
+                )
+                if user.is_authenticated
+                else set()
+            )
+        return self.context["subscribed_ids"]
 
     def update(self, instance, validated_data):
         """
@@ -125,7 +154,6 @@ class UserSubscriptionSerializer(UserMainSerializer):
     Также используется 'усеченный' сериалзитор рецептов.
     """
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
 
     class Meta(UserMainSerializer.Meta):
         fields = (
@@ -138,13 +166,22 @@ class UserSubscriptionSerializer(UserMainSerializer):
             "recipes",
             "recipes_count",
         )
-        read_only_fields = ("recipes",)
+        read_only_fields = ("recipes", "recipes_count")
 
     def get_recipes(self, obj):
         """
         Метод получения рецептов пользователя
         с пагинацией.
+        Если рецепты авторов уже выбраны одним запросом
+        (`RecipeQuerySet.latest_by_author`) и переданы в контексте,
+        берем их оттуда.
         """
+        recipes = self.context.get("recipes")
+        if recipes is not None:
+            serializer = RecipeBaseSerializer(
+                recipes.get(obj.id, []), many=True
+            )
+            return serializer.data
         request = self.context.get("request")
         queryset = obj.recipes.all().order_by("-id")
         paginator = RecipesLimitPagination()
@@ -152,9 +189,6 @@ class UserSubscriptionSerializer(UserMainSerializer):
         serializer = RecipeBaseSerializer(paginated, many=True)
         return serializer.data
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
 
 class SubscriptionSerializer(serializers.ModelSerializer):
     """
@@ -206,7 +240,7 @@ class IngredientTypeSerializer(serializers.ModelSerializer):
     """
     class Meta:
         model = api_models.IngredientType
-        fields = "__all__"
+        fields = ("id", "name", "measurement_unit")
 
         validators = (
             serializers.UniqueTogetherValidator(
@@ -222,14 +256,16 @@ class IngredientTypeSerializer(serializers.ModelSerializer):
 class IngredientSerializer(serializers.ModelSerializer):
     """
     Сериализатор комбинированного представления
-    ингредиента (Ingredient) и его типа (IngredientType).
+    ингредиента рецепта (RecipeIngredient) и его типа (IngredientType).
     """
-    name = IngredientTypeField(source="ingredient", read_only=True)
-    measurement_unit = IngredientUnitField(source="ingredient", read_only=True)
-    id = IngredientIdField(source="ingredient", read_only=True)
+    name = IngredientTypeField(source="ingredient_type", read_only=True)
+    measurement_unit = IngredientUnitField(
+        source="ingredient_type", read_only=True
+    )
+    id = IngredientIdField(source="ingredient_type", read_only=True)
 
     class Meta:
-        model = api_models.Ingredient
+        model = api_models.RecipeIngredient
         fields = (
             "id",
             "name",
@@ -241,14 +277,14 @@ class IngredientSerializer(serializers.ModelSerializer):
 class CreateIngredientSerializer(serializers.ModelSerializer):
     """
     Сериализатор для валидации и сохранения
-    ингредиента (Ingredient) при создании рецепта (Recipe).
+    ингредиента рецепта (RecipeIngredient) при создании рецепта (Recipe).
+    Существование типов ингредиентов проверяется одним запросом
+    на весь рецепт в RecipeCreateUpdateSerializer.validate_ingredients.
     """
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=api_models.IngredientType.objects.all()
-    )
+    id = serializers.IntegerField()
 
     class Meta:
-        model = api_models.Ingredient
+        model = api_models.RecipeIngredient
         fields = (
             "id",
             "amount",
@@ -260,7 +296,7 @@ class RecipeReadOnlySerializer(serializers.ModelSerializer):
     Сериализатор основного представления моедли Recipe.
     """
     author = UserMainSerializer()
-    ingredients = IngredientSerializer(many=True)
+    ingredients = IngredientSerializer(source="recipe_ingredients", many=True)
     tags = TagSerializer(many=True)
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
@@ -295,21 +331,24 @@ class RecipeReadOnlySerializer(serializers.ModelSerializer):
         """
         Находится ли рецепт в избранных пользователя.
         """
-        return (
-            self.context.get("request")
-            .user.favorites.filter(id=obj.id)
-            .exists()
-        )
+        return self._get_user_flag(obj, "is_favorited", "favorites")
 
     def get_is_in_shopping_cart(self, obj: api_models.Recipe) -> bool:
         """
         Находится ли рецепт в корзине пользователя.
         """
-        return (
-            self.context.get("request")
-            .user.shopping_cart.filter(id=obj.id)
-            .exists()
-        )
+        return self._get_user_flag(obj, "is_in_shopping_cart", "shopping_cart")
+
+    def _get_user_flag(self, obj, flag_name, attr_name):
+        """
+        Берем флаг из аннотации `RecipeQuerySet.with_user_flags`,
+        если рецепт получен без нее - делаем отдельный запрос.
+        """
+        flag = getattr(obj, flag_name, None)
+        if flag is not None:
+            return flag
+        user = self.context.get("request").user
+        return getattr(user, attr_name).filter(id=obj.id).exists()
 
 
 class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
@@ -318,6 +357,11 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
     """
     author = serializers.HiddenField(default=serializers.CurrentUserDefault())
     ingredients = CreateIngredientSerializer(many=True)
+    # у Recipe.tags явная промежуточная модель RecipeTag, поэтому
+    # DRF делает поле только для чтения: объявляем и сохраняем сами
+    tags = serializers.PrimaryKeyRelatedField(
+        queryset=api_models.Tag.objects.all(), many=True
+    )
     image = Base64ImageField()
 
     class Meta:
@@ -332,25 +376,49 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             "author",
         )
 
+    def validate_ingredients(self, value):
+        """
+        Проверяем одним запросом, что все типы ингредиентов существуют,
+        и что ингредиенты в рецепте не повторяются.
+        """
+        ids = [item["id"] for item in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError(
+                "Ошибка! Ингредиенты в рецепте не должны повторяться."
+            )
+        existing = set(
+            api_models.IngredientType.objects.filter(id__in=ids).values_list(
+                "id", flat=True
+            )
+        )
+        if missing := set(ids) - existing:
+            raise serializers.ValidationError(
+                f"Ошибка! Ингредиенты с id {sorted(missing)} не существуют."
+            )
+        return value
+
+    @transaction.atomic
     def create(self, validated_data):
         """
         DRF по умолчанию не сериализует глубоко вложенные связи моделей.
-        Т.к. у нас модель Ingredient связана с моделью IngredientType,
-        при получении запроса мы сначала сериализуем именно IngredientType,
-        чтобы понять, что такой тип ингредиента существует.
-
-        Если тип ингредиента и его количество прошли валидацию,то мы:
+        Т.к. ингредиенты рецепта хранятся в отдельной модели
+        RecipeIngredient, то мы:
           1. Убираем словарь ingredients валидированных данных.
           2. Создаем экземпляр рецепта без ингредиентов.
-          3. По каждому ключу словаря ingredients
-             создаем экземпляр класса Ingredient и добавляем
-             в соответствующий атрибут экземпляра рецепта.
+          3. Создаем все экземпляры RecipeIngredient одним запросом.
+        Тэги (RecipeTag) тоже создаются одним запросом.
+        Количество ингредиентов сохраняем в рецепте для поиска
+        по имеющимся продуктам (`RecipeQuerySet.cookable_from`).
         """
         ingredients = validated_data.pop("ingredients")
+        tags = validated_data.pop("tags")
+        validated_data["ingredients_count"] = len(ingredients)
         instance = super().create(validated_data)
         self.add_ingredients_to_recipe(instance, ingredients)
+        self.add_tags_to_recipe(instance, tags)
         return instance
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         if "author" in self.initial_data:
             raise serializers.ValidationError(
@@ -359,16 +427,42 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         # удаляем старое фото, чтобы не засорять хранилище
         instance.image.storage.delete(instance.image.name)
         new_ingredients = validated_data.pop("ingredients")
-        instance.ingredients.all().delete()
+        new_tags = validated_data.pop("tags", None)
+        validated_data["ingredients_count"] = len(new_ingredients)
+        # пересчитываем итоговые корзины, где есть этот рецепт
+        remove_recipe_from_carts(instance.id)
+        instance.recipe_ingredients.all().delete()
         self.add_ingredients_to_recipe(instance, new_ingredients)
+        add_recipe_to_carts(instance.id)
+        if new_tags is not None:
+            instance.recipe_tags.all().delete()
+            self.add_tags_to_recipe(instance, new_tags)
         return super().update(instance, validated_data)
 
+    def add_tags_to_recipe(self, instance, tags):
+        """
+        Создаем связи рецепта с тэгами одним запросом.
+        """
+        api_models.RecipeTag.objects.bulk_create(
+            api_models.RecipeTag(recipe=instance, tag=tag) for tag in tags
+        )
+
     def add_ingredients_to_recipe(self, instance, ingredients):
-        for item in ingredients:
-            ingredient, _ = api_models.Ingredient.objects.get_or_create(
-                ingredient=item["id"], amount=item["amount"]
+        """
+        Создаем ингредиенты рецепта одним запросом и обновляем
+        MinHash сигнатуру рецепта для поиска похожих.
+        """
+        api_models.RecipeIngredient.objects.bulk_create(
+            api_models.RecipeIngredient(
+                recipe=instance,
+                ingredient_type_id=item["id"],
+                amount=item["amount"],
             )
-            instance.ingredients.add(ingredient)
+            for item in ingredients
+        )
+        update_recipe_minhash(
+            instance.id, [item["id"] for item in ingredients]
+        )
 
     def to_representation(self, instance):
         """
@@ -380,6 +474,17 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
         return serializer.data
 
 
+class ShoppingListExportSerializer(serializers.ModelSerializer):
+    """
+    Сериализатор представления выгрузок списка покупок
+    (ShoppingListExport).
+    """
+    class Meta:
+        model = api_models.ShoppingListExport
+        fields = ("id", "status", "error", "created", "finished")
+        read_only_fields = fields
+
+
 class PasswordSerializer(serializers.Serializer):
     """
     Сериализатор для вью смены пароля.
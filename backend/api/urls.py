@@ -8,6 +8,7 @@ router.register("tags", api_views.TagViewSet)
 router.register("ingredients", api_views.IngredientViewSet)
 router.register("recipes", api_views.RecipeViewSet)
 router.register("users", api_views.UserViewset)
+router.register("exports", api_views.ShoppingListExportViewSet)
 
 app_name = "api"
 
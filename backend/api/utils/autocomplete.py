@@ -0,0 +1,179 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, FloatField, Func, Value
+
+from .search import normalize
+
+# порог похожести для нечеткого поиска, как pg_trgm.similarity_threshold
+TRIGRAM_SIMILARITY_THRESHOLD = 0.3
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def trigrams(value: str) -> set:
+    """
+    Множество триграмм строки по правилам pg_trgm:
+    каждое слово дополняется двумя пробелами слева и одним справа.
+    """
+    result = set()
+    for word in WORD_PATTERN.findall(normalize(value)):
+        word = f"  {word} "
+        result.update(word[i:i + 3] for i in range(len(word) - 2))
+    return result
+
+
+def fuzzy_search(query: str, limit: int = None) -> list:
+    """
+    Нечеткий поиск ингредиентов по названию с учетом опечаток,
+    по убыванию похожести триграмм.
+    В PostgreSQL - расширение pg_trgm и GIN индекс по нормализованному
+    названию (name_search), в остальных БД - триграммный индекс
+    в памяти процесса.
+    """
+    if connection.vendor != "postgresql":
+        return ingredient_index.fuzzy_search(query, limit)
+    query = normalize(query)
+    model = apps.get_model("api", "IngredientType")
+    queryset = (
+        model.objects.extra(
+            where=[f'"{model._meta.db_table}"."name_search" %% %s'],
+            params=[query],
+        )
+        .annotate(
+            similarity=Func(
+                F("name_search"),
+                Value(query),
+                function="similarity",
+                output_field=FloatField(),
+            )
+        )
+        .order_by("-similarity", "name")
+        .values("id", "name", "measurement_unit")
+    )
+    return list(queryset[:limit] if limit else queryset)
+
+
+class IngredientIndex:
+    """
+    Индекс названий ингредиентов (IngredientType) в памяти процесса
+    для автодополнения без запросов к БД.
+    Хранит отсортированный массив нормализованных названий:
+      - совпадения по началу названия ищутся бинарным поиском;
+      - совпадения по подстроке - одним проходом по массиву;
+      - для нечеткого поиска - списки позиций названий по триграммам.
+    Строится при первом обращении и перестраивается, если таблица
+    изменилась в этом процессе (см. invalidate) или индекс старше
+    INGREDIENT_INDEX_TIMEOUT секунд (изменения в других процессах).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = ([], [], {}, [])
+        self._built_at = None
+
+    def invalidate(self, *args, **kwargs):
+        """
+        Пометить индекс устаревшим. Подключается к сигналам
+        сохранения и удаления IngredientType.
+        """
+        self._built_at = None
+
+    def build(self):
+        model = apps.get_model("api", "IngredientType")
+        rows = sorted(
+            (normalize(name), pk, name, measurement_unit)
+            for pk, name, measurement_unit in model.objects.values_list(
+                "id", "name", "measurement_unit"
+            )
+        )
+        keys = [row[0] for row in rows]
+        items = [
+            {"id": pk, "name": name, "measurement_unit": measurement_unit}
+            for _, pk, name, measurement_unit in rows
+        ]
+        postings = defaultdict(list)
+        sizes = []
+        for position, key in enumerate(keys):
+            key_trigrams = trigrams(key)
+            sizes.append(len(key_trigrams))
+            for trigram in key_trigrams:
+                postings[trigram].append(position)
+        self._data = (keys, items, dict(postings), sizes)
+        self._built_at = time.monotonic()
+
+    def search(self, query: str, limit: int = None) -> list:
+        """
+        Ингредиенты, в названии которых есть query.
+        Сначала совпадения по началу названия (по алфавиту),
+        затем по подстроке (чем ближе к началу, тем выше).
+        """
+        self._ensure_built()
+        keys, items, *_ = self._data
+        query = normalize(query)
+        result = []
+        position = bisect_left(keys, query)
+        while position < len(keys) and keys[position].startswith(query):
+            result.append(items[position])
+            if limit and len(result) == limit:
+                return result
+            position += 1
+        found = sorted(
+            (index, position)
+            for position, key in enumerate(keys)
+            if (index := key.find(query)) > 0
+        )
+        result.extend(items[position] for _, position in found)
+        return result[:limit] if limit else result
+
+    def fuzzy_search(self, query: str, limit: int = None) -> list:
+        """
+        Ингредиенты, похожие на query с учетом опечаток.
+        Похожесть - доля общих триграмм (как similarity в pg_trgm),
+        кандидаты берутся из списков позиций по триграммам запроса.
+        """
+        self._ensure_built()
+        keys, items, postings, sizes = self._data
+        query_trigrams = trigrams(query)
+        shared = Counter()
+        for trigram in query_trigrams:
+            shared.update(postings.get(trigram, ()))
+        found = []
+        for position, count in shared.items():
+            similarity = count / (
+                len(query_trigrams) + sizes[position] - count
+            )
+            if similarity >= TRIGRAM_SIMILARITY_THRESHOLD:
+                found.append((-similarity, keys[position], position))
+        found.sort()
+        result = [items[position] for _, _, position in found]
+        return result[:limit] if limit else result
+
+    def _ensure_built(self):
+        """
+        Перестроить индекс, если он устарел (один поток за раз).
+        """
+        if self._is_fresh():
+            return
+        with self._lock:
+            if not self._is_fresh():
+                self.build()
+
+    def _is_fresh(self):
+        """
+        Построен ли индекс и не истек ли срок его жизни.
+        """
+        return (
+            self._built_at is not None
+            and time.monotonic() - self._built_at
+            < settings.INGREDIENT_INDEX_TIMEOUT
+        )
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,163 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Sum
+
+BATCH_SIZE = 1000
+SHOPPING_LIST_TEMPLATE = "shopping_list.html"
+
+
+def _recipe_amounts(recipe_ids):
+    """
+    Суммарное количество каждого ингредиента рецептов recipe_ids.
+    """
+    recipe_ingredient_model = apps.get_model("api", "RecipeIngredient")
+    return dict(
+        recipe_ingredient_model.objects.filter(recipe_id__in=recipe_ids)
+        .values("ingredient_type_id")
+        .order_by()
+        .annotate(total=Sum("amount"))
+        .values_list("ingredient_type_id", "total")
+    )
+
+
+@transaction.atomic
+def change_cart(user_id, recipe_ids, sign=1):
+    """
+    Прибавить (sign=1) или вычесть (sign=-1) ингредиенты рецептов
+    recipe_ids из корзины пользователя user_id.
+    На время изменения блокируется строка пользователя: блокировка
+    строк корзины не защищает от того, что два параллельных запроса
+    создадут одну и ту же новую строку (unique_cart_item).
+    """
+    user_model = apps.get_model("api", "User")
+    cart_item_model = apps.get_model("api", "CartItem")
+    amounts = _recipe_amounts(recipe_ids)
+    if not amounts:
+        return
+    list(
+        user_model.objects.select_for_update()
+        .filter(pk=user_id)
+        .values_list("pk", flat=True)
+    )
+    existing = cart_item_model.objects.filter(
+        user_id=user_id, ingredient_type_id__in=amounts
+    )
+    changed, emptied = [], []
+    for item in existing:
+        item.total += sign * amounts.pop(item.ingredient_type_id)
+        if item.total > 0:
+            changed.append(item)
+        else:
+            emptied.append(item.pk)
+    cart_item_model.objects.bulk_update(
+        changed, ["total"], batch_size=BATCH_SIZE
+    )
+    cart_item_model.objects.filter(pk__in=emptied).delete()
+    if sign > 0:
+        cart_item_model.objects.bulk_create(
+            (
+                cart_item_model(
+                    user_id=user_id, ingredient_type_id=pk, total=total
+                )
+                for pk, total in amounts.items()
+            ),
+            batch_size=BATCH_SIZE,
+        )
+
+
+def rebuild_cart_items(apps, user_ids=None):
+    """
+    Пересчитать корзины пользователей user_ids (по умолчанию - всех)
+    по рецептам в корзине одним сгруппированным запросом.
+    """
+    recipe_model = apps.get_model("api", "Recipe")
+    cart_item_model = apps.get_model("api", "CartItem")
+    carts = recipe_model.added_to_cart.through.objects.all()
+    items = cart_item_model.objects.all()
+    if user_ids is not None:
+        carts = carts.filter(user_id__in=user_ids)
+        items = items.filter(user_id__in=user_ids)
+    totals = (
+        carts.filter(recipe__recipe_ingredients__isnull=False)
+        .values("user_id", "recipe__recipe_ingredients__ingredient_type_id")
+        .order_by()
+        .annotate(total=Sum("recipe__recipe_ingredients__amount"))
+        .values_list(
+            "user_id",
+            "recipe__recipe_ingredients__ingredient_type_id",
+            "total",
+        )
+    )
+    new_items = [
+        cart_item_model(user_id=user_id, ingredient_type_id=pk, total=total)
+        for user_id, pk, total in totals
+    ]
+    items.delete()
+    cart_item_model.objects.bulk_create(new_items, batch_size=BATCH_SIZE)
+
+
+def _cart_user_ids(recipe_id):
+    """
+    Id пользователей, у которых рецепт в корзине, по возрастанию:
+    корзины блокируются всегда в одном порядке.
+    """
+    recipe_model = apps.get_model("api", "Recipe")
+    return list(
+        recipe_model.added_to_cart.through.objects.filter(recipe_id=recipe_id)
+        .order_by("user_id")
+        .values_list("user_id", flat=True)
+    )
+
+
+def add_recipe_to_carts(recipe_id):
+    """
+    Прибавить ингредиенты рецепта к корзинам всех пользователей,
+    у которых он в корзине (после изменения состава рецепта).
+    """
+    for user_id in _cart_user_ids(recipe_id):
+        change_cart(user_id, [recipe_id], 1)
+
+
+def remove_recipe_from_carts(recipe_id):
+    """
+    Вычесть ингредиенты рецепта из корзин всех пользователей,
+    у которых он в корзине (перед изменением состава или удалением).
+    """
+    for user_id in _cart_user_ids(recipe_id):
+        change_cart(user_id, [recipe_id], -1)
+
+
+def refresh_recipe_in_carts(recipe_id):
+    """
+    Пересчитать корзины всех пользователей с рецептом recipe_id,
+    когда старый состав рецепта уже недоступен (например, ингредиенты
+    изменены через админку).
+    """
+    rebuild_cart_items(apps, _cart_user_ids(recipe_id))
+
+
+def shopping_list_rows(user):
+    """
+    Строки итоговой корзины пользователя (ингредиент, единица,
+    количество) по алфавиту. Один запрос, читается по мере обхода.
+    """
+    return (
+        user.cart_items.order_by("ingredient_type__name")
+        .values_list(
+            "ingredient_type__name",
+            "ingredient_type__measurement_unit",
+            "total",
+        )
+        .iterator()
+    )
+
+
+def shopping_list_context(user):
+    """
+    Контекст шаблона списка покупок: строки итоговой корзины
+    пользователя читаются одним запросом, без суммирования по рецептам.
+    """
+    shopping_dict = {}
+    for ingredient, unit, amount in shopping_list_rows(user):
+        shopping_dict.update({ingredient: str(amount) + " " + unit})
+    return {"username": user.username, "list": shopping_dict}
@@ -0,0 +1,71 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def change_counter(model, pk, field_name, delta):
+    """
+    Атомарно изменить счетчик field_name экземпляра модели на delta.
+    Значение меняется в БД через F(), поэтому параллельные запросы
+    не затирают изменения друг друга. Ниже нуля счетчик не опускается.
+    """
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f"{field_name}__gte": -delta})
+    queryset.update(**{field_name: F(field_name) + delta})
+
+
+def _count_subquery(queryset, field_name):
+    """
+    Подзапрос: число строк queryset, где field_name равно pk.
+    """
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field_name: OuterRef("pk")})
+            .order_by()
+            .values(field_name)
+            .annotate(total=Count("pk"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+def rebuild_counters(apps):
+    """
+    Пересчитать все счетчики по данным БД.
+    Каждая модель обновляется одним запросом UPDATE с подзапросами.
+    Из миграций функция вызывается с историческими моделями,
+    поэтому пересчитываем только счетчики, уже существующие в модели.
+    """
+    user_model = apps.get_model("api", "User")
+    recipe_model = apps.get_model("api", "Recipe")
+    recipe_ingredient_model = apps.get_model("api", "RecipeIngredient")
+    subscription_model = apps.get_model("api", "Subscription")
+    counters = {
+        recipe_model: {
+            "favorites_count": (
+                recipe_model.favorited_by.through.objects.all(),
+                "recipe_id",
+            ),
+            "ingredients_count": (
+                recipe_ingredient_model.objects.all(),
+                "recipe_id",
+            ),
+        },
+        user_model: {
+            "recipes_count": (recipe_model.objects.all(), "author_id"),
+            "subscribers_count": (
+                subscription_model.objects.all(),
+                "subscribed_to_id",
+            ),
+        },
+    }
+    for model, fields in counters.items():
+        existing = {field.name for field in model._meta.get_fields()}
+        model.objects.update(
+            **{
+                name: _count_subquery(queryset, field_name)
+                for name, (queryset, field_name) in fields.items()
+                if name in existing
+            }
+        )
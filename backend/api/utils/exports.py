@@ -0,0 +1,171 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from .cart import SHOPPING_LIST_TEMPLATE, shopping_list_context
+from .pdf_generator import render_pdf_bytes, rendering_context
+
+# пул процессов создается лениво, один на процесс gunicorn
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker():
+    """
+    Процессы пула запускаются через spawn и настраивают django заново:
+    DJANGO_SETTINGS_MODULE они наследуют из окружения.
+    """
+    import django
+
+    django.setup()
+    rendering_context.warm_up()
+
+
+def get_export_pool():
+    """
+    Пул процессов для формирования выгрузок.
+    При settings.EXPORT_WORKERS = 0 пула нет, выгрузки формируются
+    прямо в запросе.
+    """
+    global _pool
+    if not settings.EXPORT_WORKERS:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.EXPORT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        return _pool
+
+
+def _reset_export_pool():
+    """
+    Закрыть сломанный пул, следующий вызов get_export_pool создаст новый.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = None
+
+
+def export_path(file_name):
+    return Path(settings.EXPORTS_ROOT) / file_name
+
+
+def run_export(export_id):
+    """
+    Сформировать PDF выгрузки export_id и записать его в EXPORTS_ROOT.
+    Выгрузку берет только тот, кто перевел ее из очереди в работу.
+    Файл пишется во временный и переименовывается, поэтому
+    недописанный файл никогда не отдается. Итог записывается, только
+    если выгрузку тем временем не сочли зависшей.
+    """
+    export_model = apps.get_model("api", "ShoppingListExport")
+    taken = export_model.objects.filter(
+        id=export_id, status=export_model.PENDING
+    ).update(status=export_model.RUNNING)
+    if not taken:
+        return
+    export = export_model.objects.select_related("user").get(id=export_id)
+    running = export_model.objects.filter(
+        id=export_id, status=export_model.RUNNING
+    )
+    try:
+        content = render_pdf_bytes(
+            shopping_list_context(export.user), SHOPPING_LIST_TEMPLATE
+        )
+        file_name = f"{export.user_id}/{export.id}.pdf"
+        path = export_path(file_name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_suffix(".tmp")
+        temp_path.write_bytes(content)
+        os.replace(temp_path, path)
+    except Exception as error:
+        running.update(
+            status=export_model.FAILED,
+            error=str(error),
+            finished=timezone.now(),
+        )
+        return
+    finished = running.update(
+        status=export_model.DONE, file=file_name, finished=timezone.now()
+    )
+    if not finished:
+        # выгрузку уже сочли зависшей (fail_stale_exports) или удалили
+        path.unlink(missing_ok=True)
+
+
+def _run_export_in_worker(export_id):
+    """
+    Между заданиями процесс пула не держит открытых соединений с БД.
+    """
+    try:
+        run_export(export_id)
+    finally:
+        connections.close_all()
+
+
+def _submit(export_id):
+    """
+    Отдать выгрузку пулу, пересоздав пул, если его процесс упал.
+    """
+    try:
+        get_export_pool().submit(_run_export_in_worker, export_id)
+    except BrokenProcessPool:
+        _reset_export_pool()
+        get_export_pool().submit(_run_export_in_worker, export_id)
+
+
+def submit_export(export):
+    """
+    Поставить выгрузку в очередь пула процессов после фиксации
+    транзакции (процесс пула должен увидеть запись).
+    Без пула выгрузка формируется сразу.
+    """
+    if get_export_pool() is None:
+        run_export(export.id)
+        return
+    transaction.on_commit(lambda: _submit(export.id))
+
+
+def fail_stale_exports(queryset=None):
+    """
+    Пометить ошибочными выгрузки, не сформированные за
+    settings.EXPORT_TIMEOUT секунд. Задания живут только в памяти пула
+    процесса gunicorn: после перезапуска или падения процесса их никто
+    не возьмет, и без этого клиент ждал бы выгрузку бесконечно.
+    Возвращаем количество таких выгрузок.
+    """
+    export_model = apps.get_model("api", "ShoppingListExport")
+    if queryset is None:
+        queryset = export_model.objects.all()
+    deadline = timezone.now() - timedelta(seconds=settings.EXPORT_TIMEOUT)
+    return queryset.filter(
+        status__in=(export_model.PENDING, export_model.RUNNING),
+        created__lt=deadline,
+    ).update(
+        status=export_model.FAILED,
+        error="Выгрузка не сформировалась вовремя, запросите ее заново.",
+        finished=timezone.now(),
+    )
+
+
+def delete_exports(queryset):
+    """
+    Удалить выгрузки вместе с их файлами.
+    """
+    for file_name in queryset.exclude(file="").values_list("file", flat=True):
+        export_path(file_name).unlink(missing_ok=True)
+    queryset.delete()
@@ -0,0 +1,150 @@
+from django.apps import apps
+from django.conf import settings
+from django.db.models import Exists, F, OuterRef, Q
+
+BATCH_SIZE = 1000
+
+
+def fan_out_recipe(recipe):
+    """
+    Разложить новый рецепт по лентам подписчиков автора (FeedEntry).
+    У авторов с подписчиками больше FEED_FANOUT_LIMIT рецепты
+    в ленты не раскладываются, а подмешиваются при чтении ленты.
+    """
+    user_model = apps.get_model("api", "User")
+    subscription_model = apps.get_model("api", "Subscription")
+    feed_entry_model = apps.get_model("api", "FeedEntry")
+    if user_model.objects.filter(
+        pk=recipe.author_id,
+        subscribers_count__gt=settings.FEED_FANOUT_LIMIT,
+    ).exists():
+        return
+    subscriber_ids = subscription_model.objects.filter(
+        subscribed_to_id=recipe.author_id
+    ).values_list("subscriber_id", flat=True)
+    feed_entry_model.objects.bulk_create(
+        (
+            feed_entry_model(user_id=subscriber_id, recipe_id=recipe.id)
+            for subscriber_id in subscriber_ids.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_feed(subscriber_ids, author_id):
+    """
+    Добавить в ленты подписчиков subscriber_ids последние
+    FEED_BACKFILL_SIZE рецептов автора (если рецепты автора
+    раскладываются по лентам).
+    """
+    user_model = apps.get_model("api", "User")
+    recipe_model = apps.get_model("api", "Recipe")
+    feed_entry_model = apps.get_model("api", "FeedEntry")
+    if user_model.objects.filter(
+        pk=author_id, subscribers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).exists():
+        return
+    recipe_ids = list(
+        recipe_model.objects.filter(author_id=author_id)
+        .order_by("-id")
+        .values_list("id", flat=True)[:settings.FEED_BACKFILL_SIZE]
+    )
+    feed_entry_model.objects.bulk_create(
+        (
+            feed_entry_model(user_id=subscriber_id, recipe_id=recipe_id)
+            for subscriber_id in subscriber_ids
+            for recipe_id in recipe_ids
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def remove_from_feed(subscriber_id, author_id, subscribers_count):
+    """
+    Убрать рецепты автора из ленты отписавшегося пользователя.
+    Если после отписки рецепты автора снова раскладываются по лентам
+    (subscribers_count опустился до FEED_FANOUT_LIMIT), дополняем ленты
+    оставшихся подписчиков рецептами, вышедшими без раскладки.
+    """
+    subscription_model = apps.get_model("api", "Subscription")
+    feed_entry_model = apps.get_model("api", "FeedEntry")
+    feed_entry_model.objects.filter(
+        user_id=subscriber_id, recipe__author_id=author_id
+    ).delete()
+    if subscribers_count == settings.FEED_FANOUT_LIMIT:
+        backfill_feed(
+            subscription_model.objects.filter(
+                subscribed_to_id=author_id
+            ).values_list("subscriber_id", flat=True),
+            author_id,
+        )
+
+
+def feed_filter(queryset, user):
+    """
+    Рецепты ленты пользователя user.
+    Обычно это соединение с его записями FeedEntry: диапазон индекса
+    (пользователь, рецепт), сколько бы авторов он ни читал.
+    Рецепты авторов с подписчиками больше FEED_FANOUT_LIMIT
+    (fan-out on read) добавляются условием OR по автору.
+    Позиция в ленте (feed_position) - id рецепта; в основном случае
+    берется из FeedEntry, чтобы сортировка шла по тому же индексу.
+    """
+    subscription_model = apps.get_model("api", "Subscription")
+    feed_entry_model = apps.get_model("api", "FeedEntry")
+    popular_author_ids = list(
+        subscription_model.objects.filter(
+            subscriber=user,
+            subscribed_to__subscribers_count__gt=settings.FEED_FANOUT_LIMIT,
+        ).values_list("subscribed_to_id", flat=True)
+    )
+    if not popular_author_ids:
+        return queryset.filter(feed_entries__user=user).annotate(
+            feed_position=F("feed_entries__recipe_id")
+        )
+    return queryset.annotate(feed_position=F("id")).filter(
+        Q(
+            Exists(
+                feed_entry_model.objects.filter(
+                    user=user, recipe_id=OuterRef("pk")
+                )
+            )
+        )
+        | Q(author_id__in=popular_author_ids)
+    )
+
+
+def rebuild_feed(apps):
+    """
+    Заново заполнить ленты по текущим подпискам:
+    по FEED_BACKFILL_SIZE последних рецептов каждого автора,
+    чьи рецепты раскладываются по лентам.
+    """
+    subscription_model = apps.get_model("api", "Subscription")
+    recipe_model = apps.get_model("api", "Recipe")
+    feed_entry_model = apps.get_model("api", "FeedEntry")
+    feed_entry_model.objects.all().delete()
+    subscriptions = list(
+        subscription_model.objects.filter(
+            subscribed_to__subscribers_count__lte=settings.FEED_FANOUT_LIMIT
+        ).values_list("subscriber_id", "subscribed_to_id")
+    )
+    latest = {
+        author_id: list(
+            recipe_model.objects.filter(author_id=author_id)
+            .order_by("-id")
+            .values_list("id", flat=True)[:settings.FEED_BACKFILL_SIZE]
+        )
+        for author_id in {author_id for _, author_id in subscriptions}
+    }
+    feed_entry_model.objects.bulk_create(
+        (
+            feed_entry_model(user_id=subscriber_id, recipe_id=recipe_id)
+            for subscriber_id, author_id in subscriptions
+            for recipe_id in latest[author_id]
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
@@ -1,27 +1,50 @@
 import django_filters
+from django.db.models import Count, Exists, OuterRef, Q
 
-from ..models import IngredientType, Recipe
+from ..models import IngredientType, Recipe, RecipeTag, Tag
+from .search import full_text_search, search_filter
 
 BOOLEAN_CHOICES = ((0, False), (1, True))
+TAGS_MATCH_ANY = "any"
+TAGS_MATCH_ALL = "all"
+TAGS_MATCH_CHOICES = (
+    (TAGS_MATCH_ANY, "Любой из тэгов"),
+    (TAGS_MATCH_ALL, "Все тэги"),
+)
 
 
 class IngredientFilter(django_filters.FilterSet):
     """
     Для фильтрации ингредиентов по названию (части).
     """
-    name = django_filters.CharFilter(lookup_expr="icontains")
+    name = django_filters.CharFilter(method="name_filter")
 
     class Meta:
         model = IngredientType
         fields = ("name",)
 
+    def name_filter(self, queryset, name, value):
+        """
+        Поиск по нормализованному названию (name_search):
+        без учета регистра, в том числе для кириллицы,
+        сначала совпадения по началу названия.
+        """
+        return search_filter(queryset, "name_search", value)
+
 
 class RecipeFilter(django_filters.FilterSet):
     """
-    Для фильтрации рецептов по тэгам,
+    Для фильтрации рецептов по тэгам, названию (части),
+    словам из названия и описания,
     и факту нахождения в избранном или корзине.
     """
+    name = django_filters.CharFilter(method="name_filter")
+    search = django_filters.CharFilter(method="full_text_filter")
     tags = django_filters.CharFilter(method="tag_list_filter")
+    tags_match = django_filters.ChoiceFilter(
+        choices=TAGS_MATCH_CHOICES,
+        method="tags_match_filter",
+    )
     is_favorited = django_filters.ChoiceFilter(
         choices=BOOLEAN_CHOICES,
         method="is_favorited_filter"
@@ -38,16 +61,90 @@ class RecipeFilter(django_filters.FilterSet):
             "author",
         )
 
+    def name_filter(self, queryset, name, value):
+        """
+        Поиск по нормализованному названию рецепта (name_search),
+        сначала совпадения по началу названия, затем новые рецепты.
+        """
+        return search_filter(
+            queryset, "name_search", value, Recipe._meta.ordering
+        )
+
+    def full_text_filter(self, queryset, name, value):
+        """
+        Полнотекстовый поиск по названию и описанию рецепта,
+        по убыванию релевантности.
+        """
+        return full_text_search(queryset, value)
+
     def tag_list_filter(self, queryset, name, value):
         """
         Фильтрация по тэгу (допускается несколько).
           - queryset = Recipe.objects.all()
           - name = 'tags'
           - value = '1,2' - не используется нашим фронтом
+        Slug'и тэгов переводятся в id одним запросом, рецепты отбираются
+        полусоединением EXISTS по таблице связи рецепт-тэг:
+        без JOIN, размножающего строки рецептов, и без DISTINCT.
+        С параметром `tags_match=all` у рецепта должны быть все тэги.
         """
         data = dict(self.data)
-        value_list = data.get('tags')
-        return queryset.filter(**{name + "__slug__in": value_list}).distinct()
+        value_list = set(data.get(name))
+        tag_ids = list(
+            Tag.objects.filter(slug__in=value_list).values_list(
+                "id", flat=True
+            )
+        )
+        if self.data.get("tags_match") != TAGS_MATCH_ALL:
+            return queryset.filter(self._has_tags(tag_ids))
+        if len(tag_ids) < len(value_list):
+            return queryset.none()
+        for tag_id in tag_ids:
+            queryset = queryset.filter(self._has_tags([tag_id]))
+        return queryset
+
+    def get_tag_counts(self):
+        """
+        Количество рецептов по каждому тэгу при текущих фильтрах
+        (автор, избранное, корзина, тэги) одним сгруппированным запросом
+        по таблице связи рецепт-тэг.
+        В режиме "любой из тэгов" выбранные тэги не сужают выборку:
+        счетчик тэга показывает, сколько рецептов добавится при его выборе.
+        В режиме `tags_match=all` счетчик учитывает уже выбранные тэги.
+        """
+        data = self.data.copy()
+        if data.get("tags_match") != TAGS_MATCH_ALL:
+            data.pop("tags", None)
+        filterset = type(self)(
+            data, queryset=Recipe.objects.all(), request=self.request
+        )
+        recipes = filterset.qs.order_by().values("pk")
+        return (
+            Tag.objects.annotate(
+                recipes_count=Count(
+                    "recipe_tags",
+                    filter=Q(recipe_tags__recipe__in=recipes),
+                )
+            )
+            .order_by("id")
+            .values("id", "slug", "recipes_count")
+        )
+
+    def tags_match_filter(self, queryset, name, value):
+        """
+        Режим фильтрации по тэгам, учитывается в tag_list_filter.
+        """
+        return queryset
+
+    def _has_tags(self, tag_ids):
+        """
+        Условие "у рецепта есть хотя бы один из тэгов tag_ids".
+        """
+        return Exists(
+            RecipeTag.objects.filter(
+                recipe_id=OuterRef("pk"), tag_id__in=tag_ids
+            )
+        )
 
     def is_favorited_filter(self, queryset, name, value):
         """
@@ -1,5 +1,20 @@
 import csv
 
+from django.db import OperationalError
+
+from .cart import rebuild_cart_items
+from .counters import rebuild_counters
+from .feed import rebuild_feed
+from .minhash import rebuild_minhash_index
+from .popularity import seed_popularity
+from .search import (RECIPE_FTS_TABLE, rebuild_search_fields,
+                     reset_fts_table_cache, update_fts_rows)
+
+NAME_SEARCH_TRIGRAM_INDEXES = (
+    ("api_ingredienttype", "ingredient_type_name_search_trgm_idx"),
+    ("api_recipe", "recipe_name_search_trgm_idx"),
+)
+
 
 def populate_model_from_migration(apps, schema_editor, model_name, file_path):
     """
@@ -28,3 +43,174 @@ def populate_model_from_migration(apps, schema_editor, model_name, file_path):
 def reverse_func(apps, schema_editor, model_name):
     model = apps.get_model("api", model_name)
     model.objects.all().delete()
+
+
+def move_ingredients_to_recipes(apps, schema_editor):
+    """
+    Переносим количества ингредиентов из общей для всех рецептов
+    модели Ingredient в модель RecipeIngredient.
+    Повторы одного типа ингредиента в рецепте суммируем.
+    """
+    recipe_model = apps.get_model("api", "Recipe")
+    recipe_ingredient_model = apps.get_model("api", "RecipeIngredient")
+    amounts = {}
+    rows = recipe_model.ingredients.through.objects.values_list(
+        "recipe_id", "ingredient__ingredient_id", "ingredient__amount"
+    )
+    for recipe_id, ingredient_type_id, amount in rows.iterator():
+        key = (recipe_id, ingredient_type_id)
+        amounts[key] = amounts.get(key, 0) + amount
+    recipe_ingredient_model.objects.bulk_create(
+        (
+            recipe_ingredient_model(
+                recipe_id=recipe_id,
+                ingredient_type_id=ingredient_type_id,
+                amount=amount,
+            )
+            for (recipe_id, ingredient_type_id), amount in amounts.items()
+        ),
+        batch_size=1000,
+    )
+
+
+def move_ingredients_from_recipes(apps, schema_editor):
+    """
+    Обратная операция для move_ingredients_to_recipes.
+    """
+    recipe_model = apps.get_model("api", "Recipe")
+    ingredient_model = apps.get_model("api", "Ingredient")
+    recipe_ingredient_model = apps.get_model("api", "RecipeIngredient")
+    through_model = recipe_model.ingredients.through
+    for item in recipe_ingredient_model.objects.iterator():
+        ingredient, _ = ingredient_model.objects.get_or_create(
+            ingredient_id=item.ingredient_type_id, amount=item.amount
+        )
+        through_model.objects.get_or_create(
+            recipe_id=item.recipe_id, ingredient_id=ingredient.id
+        )
+
+
+def rebuild_counters_from_migration(apps, schema_editor):
+    """
+    Заполнить счетчики по данным, накопленным до их появления.
+    """
+    rebuild_counters(apps)
+
+
+def rebuild_search_fields_from_migration(apps, schema_editor):
+    """
+    Заполнить нормализованные названия для поиска.
+    """
+    rebuild_search_fields(apps)
+
+
+def rebuild_minhash_index_from_migration(apps, schema_editor):
+    """
+    Заполнить сигнатуры и LSH корзины существующих рецептов.
+    """
+    rebuild_minhash_index(apps)
+
+
+def seed_popularity_from_migration(apps, schema_editor):
+    """
+    Начальный рейтинг популярности по избранному и корзинам.
+    """
+    seed_popularity(apps)
+
+
+def rebuild_feed_from_migration(apps, schema_editor):
+    """
+    Заполнить ленты по существующим подпискам.
+    """
+    rebuild_feed(apps)
+
+
+def rebuild_cart_items_from_migration(apps, schema_editor):
+    """
+    Заполнить итоговые корзины по рецептам в корзинах.
+    """
+    rebuild_cart_items(apps)
+
+
+def create_trigram_index(apps, schema_editor):
+    """
+    Триграммный GIN индекс по названию ингредиента для нечеткого поиска.
+    Только для PostgreSQL, в остальных БД поиск идет по индексу в памяти.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS ingredient_type_name_trgm_idx "
+        "ON api_ingredienttype USING gin (name gin_trgm_ops)"
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS ingredient_type_name_trgm_idx")
+
+
+def create_name_search_trigram_indexes(apps, schema_editor):
+    """
+    Триграммные GIN индексы по name_search ингредиента и рецепта:
+    по ним идут и фильтр по вхождению подстроки (LIKE '%...%'),
+    и нечеткий поиск ингредиентов (оператор %).
+    Только для PostgreSQL, в SQLite такой фильтр просматривает таблицу.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table, index_name in NAME_SEARCH_TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {index_name} "
+            f"ON {table} USING gin (name_search gin_trgm_ops)"
+        )
+
+
+def drop_name_search_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for _, index_name in NAME_SEARCH_TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {index_name}")
+
+
+def create_full_text_index(apps, schema_editor):
+    """
+    Полнотекстовый индекс рецептов по названию и описанию.
+      - PostgreSQL: GIN индекс по tsvector с русской морфологией,
+        обновляется самой БД;
+      - SQLite: виртуальная таблица FTS5, обновляется сигналами
+        сохранения и удаления рецепта (триггеры SQLite не переживают
+        пересоздание таблицы рецептов миграциями Django).
+    Если SQLite собран без FTS5, поиск идет по названию.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS recipe_search_vector_idx "
+            "ON api_recipe USING gin "
+            "(to_tsvector('russian', name || ' ' || text))"
+        )
+    elif vendor == "sqlite":
+        try:
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {RECIPE_FTS_TABLE} USING fts5"
+                "(name, text, tokenize = 'unicode61 remove_diacritics 0')"
+            )
+        except OperationalError as e:
+            print(f"Полнотекстовый поиск недоступен: {e}.")
+            return
+        reset_fts_table_cache()
+        recipe_model = apps.get_model("api", "Recipe")
+        update_fts_rows(recipe_model.objects.values_list("id", "name", "text"))
+
+
+def drop_full_text_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "postgresql":
+        schema_editor.execute("DROP INDEX IF EXISTS recipe_search_vector_idx")
+    elif vendor == "sqlite":
+        schema_editor.execute(f"DROP TABLE IF EXISTS {RECIPE_FTS_TABLE}")
+        reset_fts_table_cache()
@@ -0,0 +1,176 @@
+import struct
+from hashlib import blake2b
+
+from django.apps import apps
+from django.db.models import Count
+
+# MinHash по множеству типов ингредиентов рецепта:
+# SIGNATURE_SIZE хеш-функций, сигнатура делится на LSH_BANDS полос
+# по LSH_ROWS значений. Рецепты с совпадающей полосой - кандидаты
+# в похожие; порог похожести кандидатов ~ (1 / LSH_BANDS) ** (1 / LSH_ROWS).
+SIGNATURE_SIZE = 32
+LSH_BANDS = 16
+LSH_ROWS = SIGNATURE_SIZE // LSH_BANDS
+# хеши должны совпадать во всех процессах и между перезапусками,
+# поэтому используем blake2b, а не встроенный hash()
+MERSENNE_PRIME = (1 << 61) - 1
+BATCH_SIZE = 1000
+SIMILAR_RECIPES_LIMIT = 6
+SIMILAR_RECIPES_MAX_LIMIT = 50
+# сколько кандидатов с наибольшим числом общих корзин сравнивать
+# на каждый возвращаемый рецепт
+SIMILAR_CANDIDATES_FACTOR = 10
+
+
+def _stable_hash(value: str, signed=False) -> int:
+    """
+    Хеш строки, одинаковый во всех процессах (в отличие от hash()).
+    """
+    digest = blake2b(value.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=signed)
+
+
+PERMUTATIONS = [
+    (
+        _stable_hash(f"minhash-a:{i}") % (MERSENNE_PRIME - 1) + 1,
+        _stable_hash(f"minhash-b:{i}") % MERSENNE_PRIME,
+    )
+    for i in range(SIGNATURE_SIZE)
+]
+
+
+def signature(ingredient_ids) -> tuple:
+    """
+    MinHash сигнатура множества id типов ингредиентов.
+    Для пустого множества - пустая сигнатура.
+    """
+    hashes = [_stable_hash(str(pk)) for pk in set(ingredient_ids)]
+    if not hashes:
+        return ()
+    return tuple(
+        min((a * value + b) % MERSENNE_PRIME for value in hashes)
+        for a, b in PERMUTATIONS
+    )
+
+
+def buckets(minhash: tuple) -> list:
+    """
+    Ключи LSH корзин сигнатуры: по одному на полосу.
+    Номер полосы входит в ключ, поэтому хранится один столбец.
+    """
+    if not minhash:
+        return []
+    return [
+        _stable_hash(
+            f"{band}:" + ",".join(map(str, minhash[start:start + LSH_ROWS])),
+            signed=True,
+        )
+        for band, start in enumerate(range(0, SIGNATURE_SIZE, LSH_ROWS))
+    ]
+
+
+def similarity(first: tuple, second: tuple) -> float:
+    """
+    Оценка коэффициента Жаккара по доле совпадающих значений сигнатур.
+    """
+    if not first or not second:
+        return 0.0
+    return sum(a == b for a, b in zip(first, second)) / SIGNATURE_SIZE
+
+
+def pack(minhash: tuple) -> bytes:
+    return struct.pack(f">{len(minhash)}Q", *minhash)
+
+
+def unpack(data) -> tuple:
+    data = bytes(data)
+    return struct.unpack(f">{len(data) // 8}Q", data)
+
+
+def update_recipe_minhash(recipe_id, ingredient_ids):
+    """
+    Пересчитать сигнатуру и LSH корзины рецепта
+    после изменения его ингредиентов.
+    """
+    signature_model = apps.get_model("api", "RecipeSignature")
+    bucket_model = apps.get_model("api", "RecipeBucket")
+    minhash = signature(ingredient_ids)
+    signature_model.objects.update_or_create(
+        recipe_id=recipe_id, defaults={"minhash": pack(minhash)}
+    )
+    bucket_model.objects.filter(recipe_id=recipe_id).delete()
+    bucket_model.objects.bulk_create(
+        bucket_model(recipe_id=recipe_id, bucket=bucket)
+        for bucket in buckets(minhash)
+    )
+
+
+def similar_recipe_ids(recipe_id, limit):
+    """
+    id не более limit рецептов, похожих на рецепт recipe_id по составу,
+    по убыванию оценки похожести.
+    Кандидаты - рецепты, попавшие хотя бы в одну общую LSH корзину
+    (один запрос по индексу корзин), их сигнатуры сравниваются в памяти.
+    Сам рецепт делит со своими корзинами все полосы и идет первым.
+    """
+    signature_model = apps.get_model("api", "RecipeSignature")
+    bucket_model = apps.get_model("api", "RecipeBucket")
+    candidates = list(
+        bucket_model.objects.filter(
+            bucket__in=bucket_model.objects.filter(
+                recipe_id=recipe_id
+            ).values("bucket")
+        )
+        .values("recipe_id")
+        .annotate(shared=Count("id"))
+        .order_by("-shared", "-recipe_id")
+        .values_list("recipe_id", flat=True)[
+            :(limit * SIMILAR_CANDIDATES_FACTOR) + 1
+        ]
+    )
+    signatures = {
+        pk: unpack(minhash)
+        for pk, minhash in signature_model.objects.filter(
+            recipe_id__in=candidates
+        ).values_list("recipe_id", "minhash")
+    }
+    target = signatures.pop(recipe_id, ())
+    ranked = sorted(
+        (
+            (similarity(target, minhash), pk)
+            for pk, minhash in signatures.items()
+        ),
+        reverse=True,
+    )
+    return [pk for score, pk in ranked[:limit] if score > 0]
+
+
+def rebuild_minhash_index(apps):
+    """
+    Пересчитать сигнатуры и LSH корзины всех рецептов.
+    Нужна после загрузки данных в обход сериализатора рецептов.
+    """
+    recipe_ingredient_model = apps.get_model("api", "RecipeIngredient")
+    signature_model = apps.get_model("api", "RecipeSignature")
+    bucket_model = apps.get_model("api", "RecipeBucket")
+    ingredients = {}
+    for recipe_id, ingredient_type_id in (
+        recipe_ingredient_model.objects.values_list(
+            "recipe_id", "ingredient_type_id"
+        ).iterator()
+    ):
+        ingredients.setdefault(recipe_id, []).append(ingredient_type_id)
+    signature_model.objects.all().delete()
+    bucket_model.objects.all().delete()
+    signatures, recipe_buckets = [], []
+    for recipe_id, ingredient_ids in ingredients.items():
+        minhash = signature(ingredient_ids)
+        signatures.append(
+            signature_model(recipe_id=recipe_id, minhash=pack(minhash))
+        )
+        recipe_buckets.extend(
+            bucket_model(recipe_id=recipe_id, bucket=bucket)
+            for bucket in buckets(minhash)
+        )
+    signature_model.objects.bulk_create(signatures, batch_size=BATCH_SIZE)
+    bucket_model.objects.bulk_create(recipe_buckets, batch_size=BATCH_SIZE)
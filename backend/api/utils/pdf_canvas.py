@@ -0,0 +1,115 @@
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen.canvas import Canvas
+
+# список покупок рисуется прямо на холсте reportlab, без разбора
+# html/css: та же разметка, что и в templates/shopping_list.html
+# (заголовок, таблица в две колонки, подвал).
+# Версия разметки входит в ключ кеша готовых PDF.
+LAYOUT_VERSION = 2
+FONT_NAME = "FreeSans"
+FONT_PATH = settings.BASE_DIR / "FreeSans.ttf"
+FONT_SIZE = 11
+HEADER_FONT_SIZE = 14
+LEADING = 15
+PAGE_WIDTH, PAGE_HEIGHT = letter
+# колонки таблицы: левый край и ширина, как у @frame в шаблоне
+COLUMNS = ((44, 245), (323, 245))
+AMOUNT_WIDTH = 80
+CELL_PADDING = 6
+TABLE_TOP = PAGE_HEIGHT - 90
+TABLE_BOTTOM = 70
+HEADER = ("Ингредиент", "Количество")
+FOOTER = "Продуктовый помощник. 2022"
+
+
+@lru_cache(maxsize=None)
+def register_font():
+    """
+    Разобрать и зарегистрировать шрифт один раз на процесс.
+    reportlab встраивает в PDF только использованные глифы шрифта.
+    """
+    pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_PATH))
+    return FONT_NAME
+
+
+def _rows(shopping_list):
+    """
+    Строки таблицы: название ингредиента разбивается на строки
+    по ширине ячейки.
+    """
+    name_width = COLUMNS[0][1] - AMOUNT_WIDTH - CELL_PADDING
+    for ingredient, amount in shopping_list.items():
+        yield simpleSplit(ingredient, FONT_NAME, FONT_SIZE, name_width), amount
+
+
+def _draw_page_frame(canvas, username):
+    """
+    Заголовок и подвал страницы.
+    """
+    canvas.setFont(FONT_NAME, HEADER_FONT_SIZE)
+    canvas.drawString(
+        50, PAGE_HEIGHT - 70, f"Список покупок пользователя {username}"
+    )
+    canvas.setFont(FONT_NAME, FONT_SIZE)
+    canvas.drawString(50, 40, FOOTER)
+
+
+def _draw_row(canvas, column, y, lines, amount):
+    """
+    Строка таблицы в колонке column, верхний край строки - y.
+    """
+    left, width = column
+    for line_number, line in enumerate(lines):
+        canvas.drawString(left, y - (line_number + 1) * LEADING, line)
+    canvas.drawString(left + width - AMOUNT_WIDTH, y - LEADING, str(amount))
+
+
+def _draw_header(canvas, column):
+    """
+    Шапка таблицы в начале колонки; возвращает верхний край
+    первой строки под ней.
+    """
+    _draw_row(canvas, column, TABLE_TOP, [HEADER[0]], HEADER[1])
+    return TABLE_TOP - LEADING
+
+
+def render_shopping_list(context) -> bytes:
+    """
+    PDF списка покупок (контекст как у шаблона shopping_list.html:
+    username и list) без html шаблона.
+    Страницы рисуются и закрываются по мере заполнения колонок,
+    шапка таблицы повторяется в начале каждой колонки.
+    """
+    register_font()
+    buffer = BytesIO()
+    canvas = Canvas(
+        buffer,
+        pagesize=letter,
+        pageCompression=1,
+        initialFontName=FONT_NAME,
+        initialFontSize=FONT_SIZE,
+    )
+    canvas.setTitle(f"Список покупок {context['username']}")
+    column = 0
+    _draw_page_frame(canvas, context["username"])
+    y = _draw_header(canvas, COLUMNS[column])
+    for lines, amount in _rows(context["list"]):
+        height = len(lines) * LEADING
+        if y - height < TABLE_BOTTOM:
+            column += 1
+            if column == len(COLUMNS):
+                canvas.showPage()
+                _draw_page_frame(canvas, context["username"])
+                column = 0
+            y = _draw_header(canvas, COLUMNS[column])
+        _draw_row(canvas, COLUMNS[column], y, lines, amount)
+        y -= height
+    canvas.save()
+    return buffer.getvalue()
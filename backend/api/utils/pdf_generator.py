@@ -1,12 +1,37 @@
 # coding: utf-8
 
+import json
+import logging
 import os
+import threading
+from functools import lru_cache
+from hashlib import blake2b
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.staticfiles import finders
+from django.core.cache import caches
 from django.http import HttpResponse
 from django.template.loader import get_template
+from reportlab.lib.fonts import addMapping
 from xhtml2pdf import pisa
+from xhtml2pdf.default import DEFAULT_FONT
+
+from . import pdf_canvas
+from .cart import SHOPPING_LIST_TEMPLATE
+
+logger = logging.getLogger(__name__)
+
+# псевдоним кеша готовых PDF в settings.CACHES
+PDF_CACHE_ALIAS = "pdf"
+# способы получения PDF (settings.PDF_RENDERER):
+# html - шаблон через xhtml2pdf, canvas - список покупок рисуется
+# напрямую средствами reportlab (utils/pdf_canvas.py)
+HTML_RENDERER = "html"
+CANVAS_RENDERER = "canvas"
+# семейство шрифта в шаблонах (font-family), под которым xhtml2pdf
+# находит заранее зарегистрированный FreeSans
+PDF_FONT_FAMILY = "freesans"
 
 
 def link_callback(uri, rel):
@@ -14,6 +39,16 @@ def link_callback(uri, rel):
     Стандарный метод из документации для того, чтобы xhtml2pdf
     имел доступ к глобальным настройкам.
     """
+    return resolve_uri(uri)
+
+
+@lru_cache(maxsize=256)
+def resolve_uri(uri):
+    """
+    Путь к статическому или медиа файлу по uri из шаблона.
+    Кешируется на процесс: поиск по finders и проверка файла
+    выполняются один раз на uri.
+    """
     result = finders.find(uri)
     if result:
         if not isinstance(result, (list, tuple)):
@@ -45,7 +80,162 @@ def link_callback(uri, rel):
     return path
 
 
-def render_pdf(request, context, template_path):
+@lru_cache(maxsize=None)
+def template_version(template_path):
+    """
+    Версия шаблона - хеш его исходного текста: после изменения шаблона
+    ранее закешированные PDF больше не используются.
+    """
+    source = rendering_context.get_template(template_path).template.source
+    return blake2b(source.encode(), digest_size=8).hexdigest()
+
+
+def pdf_cache_key(context, template_path, renderer=HTML_RENDERER):
+    """
+    Ключ кеша PDF: хеш контекста шаблона (имя пользователя
+    и содержимое корзины), способа рендера и версии шаблона
+    (для canvas - версии разметки).
+    """
+    version = (
+        template_version(template_path)
+        if renderer == HTML_RENDERER
+        else pdf_canvas.LAYOUT_VERSION
+    )
+    payload = json.dumps(
+        [renderer, template_path, version, context],
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return "pdf:" + blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+class PDFRenderError(Exception):
+    """
+    Ошибка xhtml2pdf при рендере шаблона.
+    """
+
+    def __init__(self, err, html):
+        super().__init__(f"xhtml2pdf error {err}")
+        self.err = err
+        self.html = html
+
+
+def render_html_pdf(context, template_path):
+    """
+    PDF из html шаблона через xhtml2pdf, без кеша.
+    """
+    rendering_context.register_fonts()
+    html = rendering_context.get_template(template_path).render(context)
+    buffer = BytesIO()
+    pisa_status = pisa.CreatePDF(
+        html, dest=buffer,
+        link_callback=link_callback,
+        encoding='utf-8'
+    )
+    if pisa_status.err:
+        raise PDFRenderError(pisa_status.err, html)
+    return buffer.getvalue()
+
+
+def render_canvas_pdf(context, template_path):
+    """
+    PDF списка покупок средствами reportlab, без кеша.
+    Шаблон не используется.
+    """
+    return pdf_canvas.render_shopping_list(context)
+
+
+RENDERERS = {
+    HTML_RENDERER: render_html_pdf,
+    CANVAS_RENDERER: render_canvas_pdf,
+}
+
+
+class RenderingContext:
+    """
+    Ресурсы рендера PDF, общие для всех запросов процесса:
+    скомпилированные шаблоны, зарегистрированный шрифт
+    и пути файлов из шаблонов (resolve_uri).
+    Прогревается один раз на процесс: в воркерах gunicorn
+    (gunicorn.conf.py) и в процессах пула выгрузок.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._templates = {}
+        self._fonts_registered = False
+
+    def get_template(self, template_path):
+        template = self._templates.get(template_path)
+        if template is None:
+            template = get_template(template_path)
+            self._templates[template_path] = template
+        return template
+
+    def register_fonts(self):
+        """
+        FreeSans разбирается один раз и доступен xhtml2pdf как семейство
+        PDF_FONT_FAMILY. Поэтому в шаблонах нет @font-face, и шрифт
+        не загружается заново при каждом рендере.
+        """
+        if self._fonts_registered:
+            return
+        with self._lock:
+            font_name = pdf_canvas.register_font()
+            for bold in (0, 1):
+                for italic in (0, 1):
+                    addMapping(font_name, bold, italic, font_name)
+            DEFAULT_FONT[PDF_FONT_FAMILY] = font_name
+            self._fonts_registered = True
+
+    def warm_up(self, template_paths=(SHOPPING_LIST_TEMPLATE,)):
+        """
+        Заранее загрузить шрифт и шаблоны и отрендерить пустой список,
+        чтобы первая выгрузка после запуска не была самой медленной.
+        Ошибка прогрева не мешает запуску процесса.
+        """
+        try:
+            self.register_fonts()
+            for template_path in template_paths:
+                template_version(template_path)
+                RENDERERS[settings.PDF_RENDERER](
+                    {"username": "", "list": {}}, template_path
+                )
+        except Exception:
+            logger.exception("Не удалось прогреть рендер PDF.")
+
+    def reset(self):
+        """
+        Сбросить закешированные шаблоны и пути файлов
+        (после изменения шаблонов или настроек).
+        """
+        self._templates.clear()
+        template_version.cache_clear()
+        resolve_uri.cache_clear()
+
+
+rendering_context = RenderingContext()
+
+
+def render_pdf_bytes(context, template_path, renderer=None):
+    """
+    PDF в виде байтов способом renderer (по умолчанию
+    settings.PDF_RENDERER).
+    Готовый PDF кешируется, пока не изменились корзина и шаблон.
+    """
+    renderer = renderer or settings.PDF_RENDERER
+    if renderer not in RENDERERS:
+        raise ValueError(f"Неизвестный способ рендера PDF: {renderer}.")
+    cache = caches[PDF_CACHE_ALIAS]
+    key = pdf_cache_key(context, template_path, renderer)
+    content = cache.get(key)
+    if content is None:
+        content = RENDERERS[renderer](context, template_path)
+        cache.set(key, content)
+    return content
+
+
+def render_pdf(request, context, template_path, renderer=None):
     """
     Метод рендера html шаблона в пдф.
     """
@@ -57,21 +247,19 @@ def render_pdf(request, context, template_path):
         "Content-Disposition"
     ] = f'attachment; filename="shopping_list_{request.user}.pdf"'
 
-    template = get_template(template_path)
-    html = template.render(context)
     if request.POST.get("show_html", ""):
+        html = rendering_context.get_template(template_path).render(context)
         response["Content-Type"] = "application/text"
         response["Content-Disposition"] = 'attachment; filename="report.txt"'
         response.write(html)
-    else:
-        pisa_status = pisa.CreatePDF(
-            html, dest=response,
-            link_callback=link_callback,
-            encoding='utf-8'
+        return response
+
+    try:
+        content = render_pdf_bytes(context, template_path, renderer)
+    except PDFRenderError as error:
+        return HttpResponse(
+            "We had some errors with code %s <pre>%s</pre>"
+            % (error.err, error.html)
         )
-        if pisa_status.err:
-            return HttpResponse(
-                "We had some errors with code %s <pre>%s</pre>"
-                % (pisa_status.err, html)
-            )
+    response.write(content)
     return response
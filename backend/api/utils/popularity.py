@@ -0,0 +1,138 @@
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+# виды событий (RecipeActivity.kind) и их вес в популярности рецепта
+FAVORITE_ACTIVITY = "favorite"
+SHOPPING_CART_ACTIVITY = "shopping_cart"
+ACTIVITY_WEIGHTS = {
+    FAVORITE_ACTIVITY: 1.0,
+    SHOPPING_CART_ACTIVITY: 0.5,
+}
+# рецепты с меньшей популярностью убираются из рейтинга
+MIN_POPULARITY_SCORE = 0.01
+BATCH_SIZE = 1000
+
+
+def decay(age_seconds: float) -> float:
+    """
+    Множитель затухания веса события возрастом age_seconds:
+    за POPULARITY_HALF_LIFE_DAYS вес уменьшается вдвое.
+    """
+    half_life = settings.POPULARITY_HALF_LIFE_DAYS * 24 * 60 * 60
+    return 0.5 ** (max(age_seconds, 0) / half_life)
+
+
+@transaction.atomic
+def update_popularity(apps, now=None):
+    """
+    Инкрементально пересчитать рейтинг популярности RecipePopularity:
+      1. все оценки затухают на время с прошлого пересчета
+         (один UPDATE, у всех строк одно время пересчета);
+      2. к оценкам рецептов прибавляются веса новых событий
+         RecipeActivity с затуханием от времени события;
+      3. учтенные события удаляются, рецепты с почти нулевой
+         популярностью убираются из рейтинга.
+    Работа пропорциональна числу новых событий и размеру рейтинга,
+    а не всей истории избранного и корзин.
+    Возвращаем количество учтенных событий.
+    """
+    activity_model = apps.get_model("api", "RecipeActivity")
+    popularity_model = apps.get_model("api", "RecipePopularity")
+    now = now or timezone.now()
+    last_update = popularity_model.objects.aggregate(last=Max("updated"))[
+        "last"
+    ]
+    if last_update is not None:
+        factor = decay((now - last_update).total_seconds())
+        popularity_model.objects.update(score=F("score") * factor, updated=now)
+
+    events = list(
+        activity_model.objects.filter(created__lte=now).values_list(
+            "id", "recipe_id", "kind", "created"
+        )
+    )
+    scores = defaultdict(float)
+    for _, recipe_id, kind, created in events:
+        scores[recipe_id] += ACTIVITY_WEIGHTS.get(kind, 0) * decay(
+            (now - created).total_seconds()
+        )
+    existing = popularity_model.objects.in_bulk(list(scores))
+    for recipe_id, popularity in existing.items():
+        popularity.score += scores.pop(recipe_id)
+    popularity_model.objects.bulk_update(
+        existing.values(), ["score"], batch_size=BATCH_SIZE
+    )
+    popularity_model.objects.bulk_create(
+        (
+            popularity_model(recipe_id=recipe_id, score=score, updated=now)
+            for recipe_id, score in scores.items()
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    event_ids = [event[0] for event in events]
+    for start in range(0, len(event_ids), BATCH_SIZE):
+        activity_model.objects.filter(
+            id__in=event_ids[start:start + BATCH_SIZE]
+        ).delete()
+    popularity_model.objects.filter(score__lt=MIN_POPULARITY_SCORE).delete()
+    return len(events)
+
+
+def ranking_version(apps):
+    """
+    Метка текущего рейтинга популярности - время его последнего
+    пересчета (после пересчета у всех строк одно и то же updated).
+    Пустая строка, если рейтинга еще нет.
+    """
+    popularity_model = apps.get_model("api", "RecipePopularity")
+    updated = popularity_model.objects.aggregate(last=Max("updated"))["last"]
+    return "" if updated is None else str(int(updated.timestamp() * 10**6))
+
+
+def record_activity(user_ids, recipe_ids, kind):
+    """
+    Записать события интереса пользователей user_ids к рецептам
+    recipe_ids для рейтинга популярности. Событие, которое уже ждет
+    пересчета, не дублируется (unique_recipe_activity), поэтому
+    повторное добавление не поднимает рецепт в рейтинге.
+    """
+    activity_model = apps.get_model("api", "RecipeActivity")
+    activity_model.objects.bulk_create(
+        (
+            activity_model(user_id=user_id, recipe_id=recipe_id, kind=kind)
+            for user_id in user_ids
+            for recipe_id in recipe_ids
+        ),
+        ignore_conflicts=True,
+    )
+
+
+def seed_popularity(apps):
+    """
+    Начальный рейтинг по текущему содержимому избранного и корзин:
+    время добавления там не хранится, поэтому без затухания.
+    """
+    recipe_model = apps.get_model("api", "Recipe")
+    popularity_model = apps.get_model("api", "RecipePopularity")
+    now = timezone.now()
+    scores = defaultdict(float)
+    for field_name, kind in (
+        ("favorited_by", "favorite"),
+        ("added_to_cart", "shopping_cart"),
+    ):
+        through = getattr(recipe_model, field_name).through
+        for recipe_id in through.objects.values_list("recipe_id", flat=True):
+            scores[recipe_id] += ACTIVITY_WEIGHTS[kind]
+    popularity_model.objects.all().delete()
+    popularity_model.objects.bulk_create(
+        (
+            popularity_model(recipe_id=recipe_id, score=score, updated=now)
+            for recipe_id, score in scores.items()
+        ),
+        batch_size=BATCH_SIZE,
+    )
@@ -0,0 +1,238 @@
+import re
+from functools import lru_cache
+
+from django.db import connection
+from django.db.models import (BooleanField, Case, F, FloatField, Func,
+                              IntegerField, Q, TextField, Value, When)
+from django.db.models.expressions import RawSQL
+
+# размер пачки при пересчете полей поиска
+SEARCH_FIELDS_BATCH_SIZE = 1000
+# полнотекстовый поиск рецептов:
+# PostgreSQL - GIN индекс по выражению RECIPE_SEARCH_VECTOR
+# (в запросах его повторяет RecipeSearchVector),
+# SQLite - виртуальная таблица FTS5 RECIPE_FTS_TABLE (rowid = id рецепта)
+RECIPE_SEARCH_VECTOR = (
+    "to_tsvector('russian', \"api_recipe\".\"name\" || ' ' "
+    "|| \"api_recipe\".\"text\")"
+)
+RECIPE_FTS_TABLE = "api_recipe_fts"
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def normalize(value: str) -> str:
+    """
+    Привести строку к виду для поиска: без учета регистра
+    (в том числе для кириллицы) и без различия "ё" и "е".
+    """
+    return value.casefold().replace("ё", "е")
+
+
+def search_filter(queryset, field_name, value, ordering=()):
+    """
+    Отфильтровать queryset по вхождению value в нормализованное
+    поле field_name. Совпадения по началу строки идут первыми,
+    внутри групп - в порядке ordering (по умолчанию по полю поиска).
+    Вхождение подстроки в PostgreSQL ищется по триграммному индексу
+    по name_search, в SQLite - просмотром таблицы.
+    """
+    value = normalize(value)
+    if not value:
+        return queryset
+    return (
+        queryset.filter(**{f"{field_name}__contains": value})
+        .annotate(
+            search_rank=Case(
+                When(
+                    Q(**{f"{field_name}__startswith": value}),
+                    then=Value(0),
+                ),
+                default=Value(1),
+                output_field=IntegerField(),
+            )
+        )
+        .order_by("search_rank", *(ordering or (field_name,)))
+    )
+
+
+class RecipeSearchVector(Func):
+    """
+    to_tsvector('russian', name || ' ' || text) - то же выражение,
+    что и в GIN индексе. Столбцы заданы через F(), поэтому псевдоним
+    таблицы переименовывается, когда запрос становится подзапросом.
+    """
+    template = "to_tsvector('russian', %(expressions)s)"
+    arg_joiner = " || ' ' || "
+    output_field = TextField()
+
+    def __init__(self):
+        super().__init__(F("name"), F("text"))
+
+
+class WeightedSearchVector(Func):
+    """
+    Вектор поля с весом: совпадения в названии (A) весомее, чем
+    в описании (B).
+    """
+    template = (
+        "setweight(to_tsvector('russian', %(expressions)s), '%(weight)s')"
+    )
+    output_field = TextField()
+
+
+class PlainSearchQuery(Func):
+    template = "plainto_tsquery('russian', %(expressions)s)"
+    output_field = TextField()
+
+
+class SearchMatch(Func):
+    template = "%(expressions)s"
+    arg_joiner = " @@ "
+    output_field = BooleanField()
+
+
+class SearchRank(Func):
+    function = "ts_rank"
+    output_field = FloatField()
+
+
+def postgres_full_text_search(queryset, value):
+    """
+    Полнотекстовый поиск рецептов в PostgreSQL (tsvector с русской
+    морфологией и GIN индексом), по убыванию ts_rank.
+    """
+    query = PlainSearchQuery(Value(value))
+    weighted = Func(
+        WeightedSearchVector(F("name"), weight="A"),
+        WeightedSearchVector(F("text"), weight="B"),
+        template="%(expressions)s",
+        arg_joiner=" || ",
+        output_field=TextField(),
+    )
+    return (
+        queryset.filter(SearchMatch(RecipeSearchVector(), query))
+        .annotate(text_rank=SearchRank(weighted, query))
+        .order_by("-text_rank", "-id")
+    )
+
+
+def full_text_search(queryset, value):
+    """
+    Полнотекстовый поиск рецептов по словам из названия и описания,
+    по убыванию релевантности (совпадения в названии весомее).
+      - PostgreSQL: tsvector с русской морфологией и GIN индексом;
+      - SQLite: таблица FTS5, слова запроса ищутся как префиксы;
+      - иначе: поиск по вхождению в нормализованное название.
+    """
+    if connection.vendor == "postgresql":
+        return postgres_full_text_search(queryset, value)
+    if not has_fts_table():
+        return search_filter(queryset, "name_search", value, ("-id",))
+    words = WORD_PATTERN.findall(normalize(value))
+    if not words:
+        return queryset
+    query = " ".join(f'"{word}"*' for word in words)
+    return (
+        queryset.filter(
+            id__in=RawSQL(
+                f"SELECT rowid FROM {RECIPE_FTS_TABLE} "
+                f"WHERE {RECIPE_FTS_TABLE} MATCH %s",
+                (query,),
+            )
+        )
+        .annotate(
+            text_rank=RawSQL(
+                f"SELECT -bm25({RECIPE_FTS_TABLE}, 10.0, 1.0) "
+                f"FROM {RECIPE_FTS_TABLE} WHERE {RECIPE_FTS_TABLE} MATCH %s "
+                f"AND rowid = \"api_recipe\".\"id\"",
+                (query,),
+                output_field=FloatField(),
+            )
+        )
+        .order_by("-text_rank", "-id")
+    )
+
+
+def has_fts_table():
+    """
+    Есть ли в текущей БД SQLite таблица полнотекстового поиска.
+    Ее нет, если SQLite собран без FTS5.
+    """
+    return (
+        connection.vendor == "sqlite"
+        and _fts_table_exists(connection.settings_dict["NAME"])
+    )
+
+
+@lru_cache(maxsize=None)
+def _fts_table_exists(database_name):
+    """
+    Есть ли в БД таблица FTS5 (кешируется по имени БД).
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = %s", [RECIPE_FTS_TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def reset_fts_table_cache():
+    """
+    Сбросить закешированный признак наличия таблицы FTS5
+    после ее создания или удаления.
+    """
+    _fts_table_exists.cache_clear()
+
+
+def update_fts_rows(rows):
+    """
+    Обновить строки рецептов (id, название, описание) в таблице FTS5.
+    Текст хранится нормализованным, как и слова запроса.
+    В PostgreSQL индекс по выражению обновляется самой БД.
+    """
+    if not has_fts_table():
+        return
+    rows = [(pk, normalize(name), normalize(text)) for pk, name, text in rows]
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"DELETE FROM {RECIPE_FTS_TABLE} WHERE rowid = %s",
+            [(pk,) for pk, *_ in rows],
+        )
+        cursor.executemany(
+            f"INSERT INTO {RECIPE_FTS_TABLE} (rowid, name, text) "
+            "VALUES (%s, %s, %s)",
+            rows,
+        )
+
+
+def delete_fts_rows(recipe_ids):
+    """
+    Удалить строки рецептов из таблицы FTS5.
+    """
+    if not has_fts_table():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"DELETE FROM {RECIPE_FTS_TABLE} WHERE rowid = %s",
+            [(recipe_id,) for recipe_id in recipe_ids],
+        )
+
+
+def rebuild_search_fields(apps):
+    """
+    Заполнить нормализованные поля поиска по названиям
+    и таблицу полнотекстового поиска рецептов (SQLite).
+    Нужна после загрузки данных в обход save() (миграции, bulk_create).
+    """
+    for model_name in ("IngredientType", "Recipe"):
+        model = apps.get_model("api", model_name)
+        if model_name == "Recipe":
+            update_fts_rows(model.objects.values_list("id", "name", "text"))
+        instances = []
+        for instance in model.objects.only("id", "name").iterator():
+            instance.name_search = normalize(instance.name)
+            instances.append(instance)
+        model.objects.bulk_update(
+            instances, ["name_search"], batch_size=SEARCH_FIELDS_BATCH_SIZE
+        )
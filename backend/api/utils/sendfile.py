@@ -0,0 +1,69 @@
+import mimetypes
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+
+
+def internal_url(path):
+    """
+    Адрес internal location nginx для файла path
+    по settings.X_ACCEL_LOCATIONS (настройка с каталогом -> префикс).
+    None, если файл не лежит ни в одном из этих каталогов.
+    """
+    path = Path(path).resolve()
+    for setting_name, prefix in settings.X_ACCEL_LOCATIONS.items():
+        root = Path(getattr(settings, setting_name)).resolve()
+        try:
+            relative = path.relative_to(root)
+        except ValueError:
+            continue
+        return prefix + quote(relative.as_posix())
+    return None
+
+
+def content_disposition(filename, as_attachment=True):
+    """
+    Заголовок Content-Disposition, как его формирует FileResponse:
+    имя не в ASCII передается в filename* (RFC 5987).
+    """
+    disposition = "attachment" if as_attachment else "inline"
+    try:
+        filename.encode("ascii")
+        return f'{disposition}; filename="{filename}"'
+    except UnicodeEncodeError:
+        return f"{disposition}; filename*=utf-8''{quote(filename)}"
+
+
+def send_file(path, filename=None, content_type=None, as_attachment=True):
+    """
+    Ответ с файлом, доступ к которому уже проверен.
+    При settings.X_ACCEL_REDIRECT файл отдает nginx по заголовку
+    X-Accel-Redirect (sendfile), поток gunicorn освобождается сразу.
+    Иначе, а также для файлов вне X_ACCEL_LOCATIONS,
+    файл читается через FileResponse.
+    """
+    path = Path(path)
+    if not path.is_file():
+        raise Http404("Файл не найден.")
+    filename = filename or path.name
+    content_type = (
+        content_type
+        or mimetypes.guess_type(filename)[0]
+        or "application/octet-stream"
+    )
+    url = internal_url(path) if settings.X_ACCEL_REDIRECT else None
+    if url is None:
+        return FileResponse(
+            open(path, "rb"),
+            as_attachment=as_attachment,
+            filename=filename,
+            content_type=content_type,
+        )
+    response = HttpResponse(content_type=content_type)
+    response["X-Accel-Redirect"] = url
+    response["Content-Disposition"] = content_disposition(
+        filename, as_attachment
+    )
+    return response
@@ -1,5 +1,245 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import F
+
+from ..pagination import COUNT_CACHE_VERSION_KEY, viewer_count_version_key
+from .cart import change_cart, remove_recipe_from_carts
+from .counters import change_counter
+from .feed import fan_out_recipe
+from .popularity import (FAVORITE_ACTIVITY, SHOPPING_CART_ACTIVITY,
+                         record_activity)
+from .search import delete_fts_rows, update_fts_rows
+
+
 def delete_recipe(sender, instance, *args, **kwargs):
     """
     Удалить картинку вместе с рецептом.
     """
     instance.image.storage.delete(instance.image.name)
+
+
+def increase_recipes_count(sender, instance, created, *args, **kwargs):
+    """
+    Увеличить счетчик рецептов автора при создании рецепта.
+    """
+    if created:
+        change_counter(
+            get_user_model(), instance.author_id, "recipes_count", 1
+        )
+
+
+def decrease_recipes_count(sender, instance, *args, **kwargs):
+    """
+    Уменьшить счетчик рецептов автора при удалении рецепта.
+    """
+    change_counter(get_user_model(), instance.author_id, "recipes_count", -1)
+
+
+def _bump_version(key):
+    """
+    Увеличить версию, входящую в ключи кеша.
+    """
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def invalidate_page_counts(sender, *args, **kwargs):
+    """
+    Сбросить закешированные количества объектов для пагинации
+    при записи рецептов (в том числе их тэгов) и подписок.
+    Меняем версию, входящую в ключи кеша, а не удаляем ключи по одному.
+    """
+    _bump_version(COUNT_CACHE_VERSION_KEY)
+
+
+def invalidate_user_page_counts(sender, instance, created, *args, **kwargs):
+    """
+    Сбросить количества при создании пользователя.
+    Прочие сохранения пользователя (например, last_login)
+    на количества не влияют.
+    """
+    if created:
+        _bump_version(COUNT_CACHE_VERSION_KEY)
+
+
+def invalidate_viewer_page_counts(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """
+    Сбросить количества, отфильтрованные по избранному или корзине,
+    только у пользователей, чье избранное или корзина изменились.
+    Прямая сторона связи: instance - рецепт, pk_set - пользователи;
+    обратная: instance - пользователь.
+    """
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if reverse:
+        user_ids = [instance.pk]
+    elif action == "pre_clear":
+        user_ids = sender.objects.filter(recipe_id=instance.pk).values_list(
+            "user_id", flat=True
+        )
+    else:
+        user_ids = pk_set
+    for user_id in user_ids:
+        _bump_version(viewer_count_version_key(user_id))
+
+
+def update_recipe_search_index(sender, instance, *args, **kwargs):
+    """
+    Обновить рецепт в полнотекстовом индексе (SQLite FTS5).
+    """
+    update_fields = kwargs.get("update_fields")
+    if update_fields and not {"name", "text"} & set(update_fields):
+        return
+    update_fts_rows([(instance.id, instance.name, instance.text)])
+
+
+def delete_recipe_search_index(sender, instance, *args, **kwargs):
+    """
+    Удалить рецепт из полнотекстового индекса (SQLite FTS5).
+    """
+    delete_fts_rows([instance.id])
+
+
+def fan_out_new_recipe(sender, instance, created, *args, **kwargs):
+    """
+    Добавить новый рецепт в ленты подписчиков автора.
+    """
+    if created:
+        fan_out_recipe(instance)
+
+
+def update_cart_items(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Обновить итоговую корзину при добавлении и удалении рецептов.
+    Прямая сторона связи: instance - рецепт, pk_set - пользователи;
+    обратная (user.shopping_cart): instance - пользователь, pk_set - рецепты.
+    """
+    if action in ("post_add", "post_remove"):
+        sign = 1 if action == "post_add" else -1
+        if reverse:
+            change_cart(instance.pk, pk_set, sign)
+        else:
+            for user_id in sorted(pk_set):
+                change_cart(user_id, [instance.pk], sign)
+    elif action == "pre_clear":
+        if reverse:
+            instance.cart_items.all().delete()
+        else:
+            remove_recipe_from_carts(instance.pk)
+
+
+def update_favorites_count(
+    sender, instance, action, reverse, model, pk_set, **kwargs
+):
+    """
+    Поддерживать счетчик favorites_count рецептов при любом изменении
+    избранного (API, админка, shell).
+    Прямая сторона связи: instance - рецепт, pk_set - пользователи;
+    обратная (user.favorites): instance - пользователь, pk_set - рецепты.
+    """
+    if action in ("post_add", "post_remove"):
+        sign = 1 if action == "post_add" else -1
+        if reverse:
+            for recipe_id in pk_set:
+                change_counter(model, recipe_id, "favorites_count", sign)
+        else:
+            change_counter(
+                type(instance), instance.pk, "favorites_count",
+                sign * len(pk_set),
+            )
+    elif action == "pre_clear":
+        if reverse:
+            for recipe_id in instance.favorites.values_list("pk", flat=True):
+                change_counter(model, recipe_id, "favorites_count", -1)
+        else:
+            type(instance).objects.filter(pk=instance.pk).update(
+                favorites_count=0
+            )
+
+
+def decrease_favorites_count(sender, instance, *args, **kwargs):
+    """
+    Уменьшить favorites_count рецептов из избранного удаляемого
+    пользователя. Строки избранного удаляются каскадом, а для
+    автоматической промежуточной таблицы Django не отправляет
+    ни m2m_changed, ни post_delete.
+    """
+    instance.favorites.filter(favorites_count__gte=1).update(
+        favorites_count=F("favorites_count") - 1
+    )
+
+
+def increase_subscribers_count(sender, instance, created, *args, **kwargs):
+    """
+    Увеличить счетчик подписчиков автора при создании подписки.
+    """
+    if created:
+        change_counter(
+            get_user_model(), instance.subscribed_to_id, "subscribers_count", 1
+        )
+
+
+def decrease_subscribers_count(sender, instance, *args, **kwargs):
+    """
+    Уменьшить счетчик подписчиков автора при удалении подписки,
+    в том числе каскадном (при удалении подписчика).
+    """
+    change_counter(
+        get_user_model(), instance.subscribed_to_id, "subscribers_count", -1
+    )
+
+
+def move_recipes_count_to_default_user(sender, instance, *args, **kwargs):
+    """
+    Рецепты удаляемого автора переходят пользователю по умолчанию
+    (on_delete=SET_DEFAULT, без сигналов сохранения рецептов),
+    вместе с ними переносим и счетчик рецептов.
+    """
+    default_user_id = sender.get_default_user()
+    if instance.pk == default_user_id:
+        return
+    moved = instance.recipes.count()
+    if moved:
+        change_counter(sender, default_user_id, "recipes_count", moved)
+
+
+def record_favorite_activity(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """
+    Записать событие рейтинга популярности при добавлении рецептов
+    в избранное (API, админка, shell).
+    """
+    if action == "post_add":
+        _record_added(instance, reverse, pk_set, FAVORITE_ACTIVITY)
+
+
+def record_cart_activity(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Записать событие рейтинга популярности при добавлении рецептов
+    в корзину (API, админка, shell).
+    """
+    if action == "post_add":
+        _record_added(instance, reverse, pk_set, SHOPPING_CART_ACTIVITY)
+
+
+def _record_added(instance, reverse, pk_set, kind):
+    """
+    События добавления по обе стороны связи: прямая - instance рецепт,
+    pk_set пользователи; обратная - instance пользователь, pk_set рецепты.
+    """
+    if reverse:
+        record_activity([instance.pk], pk_set, kind)
+    else:
+        record_activity(pk_set, [instance.pk], kind)
+
+
+def delete_recipe_from_carts(sender, instance, *args, **kwargs):
+    """
+    Вычесть ингредиенты удаляемого рецепта из корзин.
+    """
+    remove_recipe_from_carts(instance.pk)
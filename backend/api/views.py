@@ -1,21 +1,40 @@
+from django.apps import apps
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db.models import BooleanField, Exists, F, OuterRef, Value
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.mixins import CreateModelMixin, RetrieveModelMixin
 from rest_framework.response import Response
-from rest_framework.viewsets import ModelViewSet
+from rest_framework.viewsets import GenericViewSet, ModelViewSet
 
 from .mixins import FavoritesShoppingCartMixin
-from .models import IngredientType, Recipe, Subscription, Tag
-from .pagination import PageLimitPagination
+from .models import (IngredientType, Recipe, ShoppingListExport, Subscription,
+                     Tag)
+from .pagination import (CURSOR_PAGINATION_PARAM, CURSOR_PAGINATION_VALUE,
+                         FeedCursorPagination, PageLimitPagination,
+                         PopularRecipesCursorPagination,
+                         RecipeCursorPagination, RecipesLimitPagination)
 from .permissions import (IsAdminOrReadOnly, IsAuthorOrStaffOrReadOnly,
                           PatchDeleteForAdminOnly)
 from .serializers import (BaseUserSerializer, IngredientTypeSerializer,
-                          PasswordSerializer, RecipeCreateUpdateSerializer,
-                          RecipeReadOnlySerializer, SubscriptionSerializer,
+                          PasswordSerializer, RecipeBaseSerializer,
+                          RecipeCreateUpdateSerializer,
+                          RecipeReadOnlySerializer,
+                          ShoppingListExportSerializer, SubscriptionSerializer,
                           TagSerializer, UserMainSerializer,
                           UserSingUpSerializer, UserSubscriptionSerializer)
+from .utils.autocomplete import fuzzy_search, ingredient_index
+from .utils.exports import (delete_exports, export_path, fail_stale_exports,
+                            submit_export)
+from .utils.feed import backfill_feed, feed_filter, remove_from_feed
 from .utils.filters import IngredientFilter, RecipeFilter
+from .utils.minhash import (SIMILAR_RECIPES_LIMIT, SIMILAR_RECIPES_MAX_LIMIT,
+                            similar_recipe_ids)
+from .utils.popularity import ranking_version
+from .utils.sendfile import send_file
 
 User = get_user_model()
 
@@ -34,6 +53,33 @@ class IngredientViewSet(ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
 
+    def list(self, request, *args, **kwargs):
+        """
+        Поиск по названию (`?name=`) обслуживается индексом в памяти
+        без запросов к БД: сначала совпадения по началу названия,
+        затем по подстроке. Параметр `?limit=` ограничивает выдачу.
+        При settings.INGREDIENT_INDEX = False тот же поиск идет
+        запросом к БД через IngredientFilter.
+        С `?fuzzy=1` поиск нечеткий, по похожести триграмм,
+        и находит названия с опечатками.
+        """
+        name = request.query_params.get("name")
+        if not name:
+            return super().list(request, *args, **kwargs)
+        try:
+            limit = max(int(request.query_params.get("limit")), 0)
+        except (TypeError, ValueError):
+            limit = None
+        if request.query_params.get("fuzzy") in ("1", "true"):
+            return Response(fuzzy_search(name, limit))
+        if settings.INGREDIENT_INDEX:
+            return Response(ingredient_index.search(name, limit))
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer(
+            queryset[:limit] if limit else queryset, many=True
+        )
+        return Response(serializer.data)
+
 
 class RecipeViewSet(ModelViewSet, FavoritesShoppingCartMixin):
     """
@@ -46,6 +92,139 @@ class RecipeViewSet(ModelViewSet, FavoritesShoppingCartMixin):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        """
+        Флаги избранного и корзины текущего пользователя
+        приходят вместе с рецептами одним запросом.
+        Для чтения дополнительно подтягиваем связанные модели.
+        """
+        queryset = super().get_queryset().with_user_flags(self.request.user)
+        if self.action in ("list", "retrieve", "cook", "popular", "feed"):
+            queryset = queryset.with_related()
+        return queryset
+
+    @property
+    def paginator(self):
+        """
+        Курсорная пагинация включается параметром `?pagination=cursor`.
+        Ссылки next/previous сохраняют этот параметр.
+        """
+        if (
+            self.request.query_params.get(CURSOR_PAGINATION_PARAM)
+            == CURSOR_PAGINATION_VALUE
+        ):
+            self.pagination_class = RecipeCursorPagination
+        return super().paginator
+
+    def list(self, request, *args, **kwargs):
+        """
+        С параметром `?tag_counts=1` к выдаче добавляется количество
+        рецептов по каждому тэгу при текущих фильтрах.
+        """
+        response = super().list(request, *args, **kwargs)
+        if request.query_params.get("tag_counts") == "1":
+            filterset = self.filterset_class(
+                request.query_params, queryset=Recipe.objects.all(),
+                request=request,
+            )
+            response.data["tag_counts"] = list(filterset.get_tag_counts())
+        return response
+
+    @action(methods=["get"], detail=False)
+    def cook(self, request, *args, **kwargs):
+        """
+        Что можно приготовить из имеющихся продуктов:
+        `?ingredients=1&ingredients=2` - id имеющихся типов ингредиентов,
+        `?exclude=3` - id типов ингредиентов, которых в рецепте быть
+        не должно. Рецепты упорядочены по доле имеющихся ингредиентов.
+        """
+        ingredient_ids = self._get_id_list("ingredients")
+        if not ingredient_ids:
+            raise ValidationError(
+                {"ingredients": "Ошибка! Укажите id ингредиентов."}
+            )
+        queryset = self.get_queryset().cookable_from(
+            ingredient_ids, self._get_id_list("exclude")
+        )
+        paginator = PageLimitPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(
+        methods=["get"],
+        detail=False,
+        permission_classes=(permissions.IsAuthenticated,),
+    )
+    def feed(self, request, *args, **kwargs):
+        """
+        Лента: новые рецепты авторов, на которых подписан пользователь,
+        с курсорной пагинацией по id рецепта.
+        Фильтры списка рецептов (тэги и др.) тоже применяются.
+        """
+        queryset = feed_filter(
+            self.filter_queryset(self.get_queryset()), request.user
+        )
+        paginator = FeedCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(methods=["get"], detail=False)
+    def popular(self, request, *args, **kwargs):
+        """
+        Популярные рецепты по заранее рассчитанному рейтингу
+        (команда `updatepopularity`), с курсорной пагинацией
+        в пределах одной версии рейтинга.
+        Фильтры списка рецептов (тэги и др.) тоже применяются.
+        """
+        queryset = (
+            self.filter_queryset(self.get_queryset())
+            .filter(popularity__isnull=False)
+            .annotate(popularity_score=F("popularity__score"))
+        )
+        paginator = PopularRecipesCursorPagination(ranking_version(apps))
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(methods=["get"], detail=True)
+    def similar(self, request, *args, **kwargs):
+        """
+        Рецепты, похожие на данный по составу ингредиентов
+        (MinHash/LSH, см. utils/minhash.py), по убыванию похожести.
+        Количество ограничивается параметром `?limit=`.
+        """
+        recipe = self.get_object()
+        try:
+            limit = int(
+                request.query_params.get("limit", SIMILAR_RECIPES_LIMIT)
+            )
+            limit = max(min(limit, SIMILAR_RECIPES_MAX_LIMIT), 0)
+        except ValueError:
+            raise ValidationError({"limit": "Ошибка! Ожидается число."})
+        ids = similar_recipe_ids(recipe.id, limit)
+        recipes = Recipe.objects.in_bulk(ids)
+        serializer = RecipeBaseSerializer(
+            [recipes[pk] for pk in ids if pk in recipes],
+            many=True,
+            context=self.get_serializer_context(),
+        )
+        return Response(serializer.data)
+
+    def _get_id_list(self, param):
+        """
+        Список id из параметра запроса param (через запятую).
+        """
+        try:
+            return [
+                int(value)
+                for values in self.request.query_params.getlist(param)
+                for value in values.split(",")
+            ]
+        except ValueError:
+            raise ValidationError({param: "Ошибка! Ожидаются id."})
+
     def get_serializer_class(self):
         if self.request.method in permissions.SAFE_METHODS:
             return RecipeReadOnlySerializer
@@ -62,6 +241,20 @@ class UserViewset(ModelViewSet):
     pagination_class = PageLimitPagination
     permission_classes = (PatchDeleteForAdminOnly,)
 
+    def get_queryset(self):
+        """
+        Флаг подписки текущего пользователя приходит
+        вместе с пользователями одним запросом.
+        """
+        queryset = super().get_queryset()
+        user = self.request.user
+        if user.is_authenticated:
+            subscriptions = Subscription.objects.filter(
+                subscriber=user, subscribed_to=OuterRef("pk")
+            )
+            queryset = queryset.annotate(is_subscribed=Exists(subscriptions))
+        return queryset
+
     def get_serializer_class(self):
         if self.request.method == "POST":
             return UserSingUpSerializer
@@ -98,14 +291,27 @@ class UserViewset(ModelViewSet):
         permission_classes=[permissions.IsAuthenticated],
     )
     def subscriptions(self, *args, **kwargs):
+        """
+        Страница подписок собирается фиксированным числом запросов:
+        авторы (количество рецептов хранится в модели User),
+        затем рецепты всех авторов страницы одним оконным запросом.
+        """
         user = self.request.user
-        (
-            queryset := User.objects.filter(
-                **{"subscribers__subscriber": user}).order_by("-id")
+        queryset = (
+            User.objects.filter(subscribers__subscriber=user)
+            .annotate(is_subscribed=Value(True, output_field=BooleanField()))
+            .order_by("-id")
         )
         page = self.paginate_queryset(queryset)
-        serializer = self.serializer_class(page, many=True)
-        serializer.context["request"] = self.request
+        limit = RecipesLimitPagination().get_limit(self.request)
+        recipes = Recipe.objects.latest_by_author(
+            [author.id for author in page], limit
+        )
+        serializer = self.serializer_class(
+            page,
+            many=True,
+            context={"request": self.request, "recipes": recipes},
+        )
         return self.get_paginated_response(serializer.data)
 
     @action(
@@ -121,7 +327,12 @@ class UserViewset(ModelViewSet):
             if subscription := Subscription.objects.filter(
                 subscriber=user, subscribed_to=subscribe_to
             ):
-                subscription.delete()
+                deleted, _ = subscription.delete()
+                remove_from_feed(
+                    user.id,
+                    subscribe_to.id,
+                    subscribe_to.subscribers_count - deleted,
+                )
                 return Response(
                     f"Подписка на пользователя {subscribe_to} удалена успешно"
                 )
@@ -134,6 +345,66 @@ class UserViewset(ModelViewSet):
         serializer = SubscriptionSerializer(data=data)
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        backfill_feed([user.id], subscribe_to.id)
+        subscribe_to.subscribers_count += 1
+        subscribe_to.is_subscribed = True
         serializer = self.serializer_class(subscribe_to)
         serializer.context["request"] = self.request
         return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class ShoppingListExportViewSet(
+    CreateModelMixin, RetrieveModelMixin, GenericViewSet
+):
+    """
+    Обработка запросов на эндпоинты `/api/exports/*`:
+    выгрузки списка покупок текущего пользователя.
+    """
+    queryset = ShoppingListExport.objects.all()
+    serializer_class = ShoppingListExportSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get_queryset(self):
+        return super().get_queryset().filter(user=self.request.user)
+
+    def get_object(self):
+        """
+        Зависшие выгрузки пользователя отдаются со статусом failed,
+        а не ожидаются бесконечно.
+        """
+        fail_stale_exports(self.get_queryset())
+        return super().get_object()
+
+    def create(self, request, *args, **kwargs):
+        """
+        Задание ставится в очередь, ответ 202 приходит сразу.
+        Готовность проверяется по `/api/exports/{id}/`.
+        Завершенные и зависшие выгрузки пользователя при этом удаляются.
+        """
+        fail_stale_exports(self.get_queryset())
+        delete_exports(
+            self.get_queryset().filter(
+                status__in=(ShoppingListExport.DONE, ShoppingListExport.FAILED)
+            )
+        )
+        export = ShoppingListExport.objects.create(user=request.user)
+        submit_export(export)
+        export.refresh_from_db()
+        serializer = self.get_serializer(export)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    @action(methods=["get"], detail=True)
+    def download(self, request, *args, **kwargs):
+        """
+        Готовый PDF выгрузки. Пока выгрузка не готова - 409 и ее статус.
+        Файл отдает nginx (X-Accel-Redirect), если это включено.
+        """
+        export = self.get_object()
+        if export.status != ShoppingListExport.DONE:
+            serializer = self.get_serializer(export)
+            return Response(serializer.data, status=status.HTTP_409_CONFLICT)
+        return send_file(
+            export_path(export.file),
+            filename=f"shopping_list_{request.user}.pdf",
+            content_type="application/pdf",
+        )
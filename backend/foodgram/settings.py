@@ -83,6 +83,31 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': config(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': config('CACHE_LOCATION', default=''),
+    },
+    # готовые PDF списков покупок: ключ - хеш содержимого корзины,
+    # при переполнении вытесняется часть записей
+    'pdf': {
+        'BACKEND': config(
+            'PDF_CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': config('PDF_CACHE_LOCATION', default='pdf'),
+        'TIMEOUT': config('PDF_CACHE_TIMEOUT', cast=int, default=86400),
+        'OPTIONS': {
+            'MAX_ENTRIES': config(
+                'PDF_CACHE_MAX_ENTRIES', cast=int, default=500
+            ),
+        },
+    },
+}
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -114,6 +139,18 @@ STATIC_ROOT = BASE_DIR / 'static'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# готовые выгрузки списков покупок (не раздаются напрямую)
+EXPORTS_ROOT = config('EXPORTS_ROOT', default=BASE_DIR / 'exports')
+
+# отдача файлов после проверки доступа силами nginx:
+# ответ с заголовком X-Accel-Redirect на internal location.
+# Ключи X_ACCEL_LOCATIONS - настройки с каталогами файлов,
+# значения - префиксы internal location в docker/nginx/default.conf
+X_ACCEL_REDIRECT = config('X_ACCEL_REDIRECT', cast=bool, default=False)
+X_ACCEL_LOCATIONS = {
+    'EXPORTS_ROOT': '/protected/exports/',
+    'MEDIA_ROOT': '/protected/media/',
+}
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -131,6 +168,47 @@ REST_FRAMEWORK = {
     },
 }
 
+# количество объектов для пагинации:
+# время жизни закешированного значения (сек.)
+PAGINATION_COUNT_CACHE_TIMEOUT = config(
+    'PAGINATION_COUNT_CACHE_TIMEOUT', cast=int, default=30
+)
+# начиная с какой оценки планировщика postgres не считаем точно
+PAGINATION_COUNT_ESTIMATE_THRESHOLD = config(
+    'PAGINATION_COUNT_ESTIMATE_THRESHOLD', cast=int, default=10000
+)
+
+# поиск ингредиентов по названию через индекс в памяти процесса;
+# если выключен - запросом к БД (IngredientFilter)
+INGREDIENT_INDEX = config('INGREDIENT_INDEX', cast=bool, default=True)
+# время жизни индекса автодополнения ингредиентов в памяти (сек.)
+INGREDIENT_INDEX_TIMEOUT = config(
+    'INGREDIENT_INDEX_TIMEOUT', cast=int, default=300
+)
+
+# у авторов с большим числом подписчиков рецепты не раскладываются
+# по лентам при публикации, а подмешиваются в ленту при чтении
+FEED_FANOUT_LIMIT = config('FEED_FANOUT_LIMIT', cast=int, default=1000)
+# сколько последних рецептов автора добавить в ленту при подписке
+FEED_BACKFILL_SIZE = config('FEED_BACKFILL_SIZE', cast=int, default=50)
+
+# за сколько дней вес события в популярности рецепта уменьшается вдвое
+POPULARITY_HALF_LIFE_DAYS = config(
+    'POPULARITY_HALF_LIFE_DAYS', cast=float, default=7
+)
+
+# способ получения PDF списка покупок:
+# html - шаблон через xhtml2pdf, canvas - напрямую средствами reportlab
+PDF_RENDERER = config('PDF_RENDERER', default='html')
+
+# число процессов, формирующих выгрузки, в каждом процессе gunicorn;
+# 0 - формировать выгрузку прямо в запросе
+EXPORT_WORKERS = config('EXPORT_WORKERS', cast=int, default=2)
+# за сколько секунд выгрузка должна сформироваться: задания живут
+# в памяти пула процесса gunicorn и пропадают при его перезапуске,
+# такие выгрузки помечаются ошибочными (failstaleexports)
+EXPORT_TIMEOUT = config('EXPORT_TIMEOUT', cast=int, default=600)
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
 }
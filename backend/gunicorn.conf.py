@@ -0,0 +1,12 @@
+# Настройки gunicorn, подхватываются автоматически из рабочей директории.
+# Параметры запуска - в wsgi-entrypoint.sh.
+
+
+def post_worker_init(worker):
+    """
+    Прогреть ресурсы рендера PDF в каждом воркере после загрузки
+    приложения, чтобы первая выгрузка после деплоя не была самой медленной.
+    """
+    from api.utils.pdf_generator import rendering_context
+
+    rendering_context.warm_up()
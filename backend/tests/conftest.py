@@ -1,3 +1,16 @@
+import pytest
+
 pytest_plugins = [
     'tests.fixtures.fixture_users',
-]
\ No newline at end of file
+    'tests.fixtures.fixture_recipes',
+]
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import caches
+
+    from api.utils.autocomplete import ingredient_index
+    for cache in caches.all():
+        cache.clear()
+    ingredient_index.invalidate()
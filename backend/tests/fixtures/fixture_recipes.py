@@ -0,0 +1,52 @@
+import pytest
+
+
+@pytest.fixture
+def tags():
+    from api.models import Tag
+    return [
+        Tag.objects.create(name='Завтрак', slug='breakfast', color='#FF00AA'),
+        Tag.objects.create(name='Обед', slug='lunch', color='#00FF55'),
+        Tag.objects.create(name='Ужин', slug='supper', color='#443FFA'),
+    ]
+
+
+@pytest.fixture
+def ingredient_types():
+    from api.models import IngredientType
+    return [
+        IngredientType.objects.create(name=f'Тестовый ингредиент {i}', measurement_unit='г')
+        for i in range(5)
+    ]
+
+
+@pytest.fixture
+def recipes(admin, tags, ingredient_types):
+    from api.models import Recipe, RecipeIngredient
+    result = []
+    for i in range(8):
+        recipe = Recipe.objects.create(
+            name=f'Рецепт {i}', text='Описание', cooking_time=10, author=admin,
+            ingredients_count=len(ingredient_types)
+        )
+        recipe.tags.add(tags[i % len(tags)])
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient_type=ingredient_type, amount=number * 10)
+            for number, ingredient_type in enumerate(ingredient_types, start=1)
+        )
+        result.append(recipe)
+    return result
+
+
+@pytest.fixture
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    return tmp_path
+
+
+@pytest.fixture
+def image():
+    return (
+        'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlE'
+        'QVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+    )
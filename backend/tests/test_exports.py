@@ -0,0 +1,125 @@
+import pytest
+
+
+@pytest.fixture
+def exports_root(settings, tmp_path):
+    settings.EXPORTS_ROOT = tmp_path
+    settings.EXPORT_WORKERS = 0
+    return tmp_path
+
+
+class TestExportApi:
+    url = '/api/exports/'
+
+    @pytest.mark.django_db
+    def test_00_exports_create_and_download(
+        self, user_client, admin_client, recipes, exports_root
+    ):
+        user_client.post(f'/api/recipes/{recipes[0].id}/shopping_cart/')
+        response = user_client.post(self.url)
+        assert response.status_code == 202, (
+            f'Проверьте, что при POST запросе `{self.url}` возвращается статус 202'
+        )
+        export = response.json()
+        assert export['status'] == 'done', (
+            'Проверьте, что без пула процессов выгрузка формируется сразу'
+        )
+        response = user_client.get(f'{self.url}{export["id"]}/')
+        assert response.status_code == 200 and response.json()['status'] == 'done'
+        response = user_client.get(f'{self.url}{export["id"]}/download/')
+        assert response.status_code == 200
+        content = b''.join(response.streaming_content)
+        assert content.startswith(b'%PDF'), (
+            'Проверьте, что готовая выгрузка отдается в виде PDF'
+        )
+        assert list(exports_root.rglob('*.pdf')), (
+            'Проверьте, что файл выгрузки лежит в EXPORTS_ROOT'
+        )
+        response = admin_client.get(f'{self.url}{export["id"]}/download/')
+        assert response.status_code == 404, (
+            'Проверьте, что выгрузка недоступна другим пользователям'
+        )
+
+        response = user_client.post(self.url)
+        assert user_client.get(f'{self.url}{export["id"]}/').status_code == 404, (
+            'Проверьте, что при новой выгрузке прежние удаляются'
+        )
+        assert len(list(exports_root.rglob('*.pdf'))) == 1
+
+    @pytest.mark.django_db
+    def test_01_exports_pending(self, user_client, user, exports_root):
+        from api.models import ShoppingListExport
+        export = ShoppingListExport.objects.create(user=user)
+        response = user_client.get(f'{self.url}{export.id}/download/')
+        assert response.status_code == 409, (
+            'Проверьте, что неготовая выгрузка не отдается'
+        )
+        assert response.json()['status'] == 'pending'
+
+    @pytest.mark.django_db
+    def test_01_01_exports_stale(self, user_client, user, exports_root, settings):
+        from datetime import timedelta
+
+        from django.core.management import call_command
+        from django.utils import timezone
+
+        from api.models import ShoppingListExport
+        stale = timezone.now() - timedelta(seconds=settings.EXPORT_TIMEOUT + 1)
+        export = ShoppingListExport.objects.create(user=user)
+        ShoppingListExport.objects.filter(id=export.id).update(created=stale)
+        response = user_client.get(f'{self.url}{export.id}/')
+        assert response.json()['status'] == 'failed', (
+            'Проверьте, что выгрузка, не сформированная за EXPORT_TIMEOUT, '
+            'отдается со статусом failed'
+        )
+        running = ShoppingListExport.objects.create(
+            user=user, status=ShoppingListExport.RUNNING
+        )
+        ShoppingListExport.objects.filter(id=running.id).update(created=stale)
+        call_command('failstaleexports')
+        running.refresh_from_db()
+        assert running.status == ShoppingListExport.FAILED, (
+            'Проверьте, что команда `failstaleexports` помечает зависшие выгрузки'
+        )
+        user_client.post(self.url)
+        assert not ShoppingListExport.objects.filter(
+            id__in=(export.id, running.id)
+        ).exists(), (
+            'Проверьте, что зависшие выгрузки удаляются при новой выгрузке'
+        )
+
+    @pytest.mark.django_db
+    def test_02_exports_anonymous(self, client):
+        response = client.post(self.url)
+        assert response.status_code == 401, (
+            f'Проверьте, что POST запрос `{self.url}` требует авторизации'
+        )
+
+    @pytest.mark.django_db
+    def test_03_exports_x_accel_redirect(self, user_client, user, recipes, exports_root, settings):
+        settings.X_ACCEL_REDIRECT = True
+        user_client.post(f'/api/recipes/{recipes[0].id}/shopping_cart/')
+        export = user_client.post(self.url).json()
+        response = user_client.get(f'{self.url}{export["id"]}/download/')
+        assert response.status_code == 200
+        assert response['X-Accel-Redirect'] == f'/protected/exports/{user.id}/{export["id"]}.pdf', (
+            'Проверьте, что при X_ACCEL_REDIRECT файл выгрузки отдает nginx'
+        )
+        assert response.content == b'' and response['Content-Type'] == 'application/pdf'
+        assert 'attachment' in response['Content-Disposition']
+
+    @pytest.mark.django_db
+    def test_04_send_file_outside_locations(self, settings, tmp_path):
+        from django.http import FileResponse
+
+        from api.utils.sendfile import send_file
+        settings.X_ACCEL_REDIRECT = True
+        settings.EXPORTS_ROOT = tmp_path / 'exports'
+        settings.MEDIA_ROOT = tmp_path / 'media'
+        path = tmp_path / 'отчет.txt'
+        path.write_text('файл')
+        response = send_file(path)
+        assert isinstance(response, FileResponse), (
+            'Проверьте, что файлы вне X_ACCEL_LOCATIONS отдаются через FileResponse'
+        )
+        response.close()
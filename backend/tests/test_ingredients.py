@@ -83,3 +83,79 @@ class TestIngredientApi:
         assert response.status_code == 404, (
             'Проверьте, что при GET запросе `/api/ingredients/{id}/` возвращаете статус 404'
         )
+
+    @pytest.mark.django_db
+    def test_04_ingredients_autocomplete(self, client, django_assert_num_queries):
+        from api.models import IngredientType
+        IngredientType.objects.bulk_create([
+            IngredientType(name='Зюзюбликовые семечки', measurement_unit='г'),
+            IngredientType(name='зюзюблик', measurement_unit='г'),
+            IngredientType(name='Пюре из зюзюблика', measurement_unit='г'),
+        ])
+        response = client.get('/api/ingredients/?name=ЗЮЗЮБЛИК')
+        names = [item['name'] for item in response.json()]
+        assert names[:2] == ['зюзюблик', 'Зюзюбликовые семечки'], (
+            'Проверьте, что совпадения по началу названия идут первыми '
+            'без учета регистра'
+        )
+        assert 'Пюре из зюзюблика' in names[2:], (
+            'Проверьте, что совпадения по подстроке идут после совпадений по началу'
+        )
+        with django_assert_num_queries(0):
+            response = client.get('/api/ingredients/?name=зюзюбл&limit=1')
+        assert [item['name'] for item in response.json()] == ['зюзюблик'], (
+            'Проверьте, что поиск по названию не обращается к БД '
+            'и учитывает параметр `limit`'
+        )
+        IngredientType.objects.create(name='зюзюблик мускатный', measurement_unit='г')
+        response = client.get('/api/ingredients/?name=зюзюблик м')
+        assert [item['name'] for item in response.json()] == ['зюзюблик мускатный'], (
+            'Проверьте, что индекс перестраивается при изменении ингредиентов'
+        )
+
+    @pytest.mark.django_db
+    def test_04_01_ingredients_search_without_index(self, client, settings):
+        from api.models import IngredientType
+        for name in ('Пюре из зюзюблика', 'Зюзюбликовые семечки', 'зюзюблик', 'зёрна зюзюблика'):
+            IngredientType.objects.create(name=name, measurement_unit='г')
+        settings.INGREDIENT_INDEX = False
+        response = client.get('/api/ingredients/?name=ЗЮЗЮБЛИК')
+        names = [item['name'] for item in response.json()]
+        assert names == [
+            'зюзюблик', 'Зюзюбликовые семечки', 'зёрна зюзюблика', 'Пюре из зюзюблика'
+        ], (
+            'Проверьте, что без индекса в памяти поиск идет по `name_search` '
+            'без учета регистра, сначала совпадения по началу названия'
+        )
+        response = client.get('/api/ingredients/?name=зерна зюзю&limit=1')
+        assert [item['name'] for item in response.json()] == ['зёрна зюзюблика'], (
+            'Проверьте, что поиск не различает "ё" и "е" и учитывает `limit`'
+        )
+
+    @pytest.mark.django_db
+    def test_05_ingredients_fuzzy_search(self, client):
+        from api.models import IngredientType
+        IngredientType.objects.bulk_create([
+            IngredientType(name='зюзюблик', measurement_unit='г'),
+            IngredientType(name='зюзюблик мускатный', measurement_unit='г'),
+            IngredientType(name='кукумбер', measurement_unit='шт'),
+        ])
+        response = client.get('/api/ingredients/?name=зюзублик')
+        assert response.json() == [], (
+            'Проверьте, что без параметра `fuzzy` поиск по названию точный'
+        )
+        response = client.get('/api/ingredients/?name=зюзублик&fuzzy=1')
+        names = [item['name'] for item in response.json()]
+        assert names[0] == 'зюзюблик' and 'кукумбер' not in names, (
+            'Проверьте, что с параметром `fuzzy=1` находятся названия с опечатками'
+        )
+        response = client.get('/api/ingredients/?name=зюзублик мускатны&fuzzy=1')
+        names = [item['name'] for item in response.json()]
+        assert names[0] == 'зюзюблик мускатный', (
+            'Проверьте, что нечеткий поиск упорядочен по убыванию похожести'
+        )
+        response = client.get('/api/ingredients/?name=ЗЮЗУБЛИК&fuzzy=1&limit=1')
+        assert [item['name'] for item in response.json()] == ['зюзюблик'], (
+            'Проверьте, что нечеткий поиск не учитывает регистр '
+            'и учитывает параметр `limit`'
+        )
@@ -0,0 +1,894 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def count_queries(client, url, table=''):
+    cache.clear()
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200, (
+        f'Проверьте, что при GET запросе `{url}` возвращается статус 200'
+    )
+    return len(
+        [query for query in context.captured_queries if table in query['sql']]
+    )
+
+
+class TestRecipeApi:
+    url = '/api/recipes/'
+
+    @pytest.mark.django_db
+    def test_00_recipes_user_flags(self, user_client, user, recipes):
+        recipes[0].favorited_by.add(user)
+        recipes[1].added_to_cart.add(user)
+        response = user_client.get(f'{self.url}?limit=10')
+        assert response.status_code == 200, (
+            f'Проверьте, что при GET запросе `{self.url}` возвращается статус 200'
+        )
+        results = {item['id']: item for item in response.json()['results']}
+        assert results[recipes[0].id]['is_favorited'] is True
+        assert results[recipes[0].id]['is_in_shopping_cart'] is False
+        assert results[recipes[1].id]['is_favorited'] is False
+        assert results[recipes[1].id]['is_in_shopping_cart'] is True
+
+    @pytest.mark.django_db
+    def test_01_recipes_user_flags_queries(self, user_client, recipes):
+        for table in ('api_recipe_favorited_by', 'api_recipe_added_to_cart'):
+            small_page = count_queries(user_client, f'{self.url}?limit=2', table)
+            large_page = count_queries(user_client, f'{self.url}?limit=8', table)
+            assert small_page == large_page, (
+                'Проверьте, что флаги `is_favorited` и `is_in_shopping_cart` '
+                'не запрашиваются отдельным запросом для каждого рецепта'
+            )
+
+    @pytest.mark.django_db
+    def test_02_recipes_related_queries(self, admin_client, recipes):
+        small_page = count_queries(admin_client, f'{self.url}?limit=2')
+        large_page = count_queries(admin_client, f'{self.url}?limit=8')
+        assert small_page == large_page, (
+            'Проверьте, что автор, тэги и ингредиенты рецептов '
+            'не запрашиваются отдельно для каждого рецепта'
+        )
+        detail = count_queries(admin_client, f'{self.url}{recipes[0].id}/')
+        assert detail <= small_page, (
+            'Проверьте, что при GET запросе рецепта связанные модели '
+            'подтягиваются фиксированным числом запросов'
+        )
+
+    @pytest.mark.django_db
+    def test_03_recipes_author_subscription_queries(self, user_client, user, admin, recipes):
+        from api.models import Subscription
+        Subscription.objects.create(subscriber=user, subscribed_to=admin)
+        small_page = count_queries(user_client, f'{self.url}?limit=2')
+        large_page = count_queries(user_client, f'{self.url}?limit=8')
+        assert small_page == large_page, (
+            'Проверьте, что подписка на автора рецепта '
+            'не запрашивается отдельно для каждого рецепта'
+        )
+        response = user_client.get(self.url)
+        assert all(
+            recipe['author']['is_subscribed'] for recipe in response.json()['results']
+        ), 'Проверьте, что поле `is_subscribed` автора рецепта заполнено верно'
+
+    @pytest.mark.django_db
+    def test_04_recipe_create_update_ingredients(
+        self, admin_client, tags, ingredient_types, recipes, media_root, image
+    ):
+        from api.models import RecipeIngredient
+        data = {
+            'name': 'Новый рецепт',
+            'text': 'Описание',
+            'cooking_time': 15,
+            'image': image,
+            'tags': [tags[0].id],
+            'ingredients': [
+                {'id': ingredient_type.id, 'amount': 10}
+                for ingredient_type in ingredient_types
+            ],
+        }
+        with CaptureQueriesContext(connection) as context:
+            response = admin_client.post(self.url, data=data, format='json')
+        assert response.status_code == 201, (
+            f'Проверьте, что при POST запросе `{self.url}` с правильными данными '
+            'возвращается статус 201'
+        )
+        inserts = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('INSERT INTO "api_recipeingredient"')
+        ]
+        assert len(inserts) == 1, (
+            'Проверьте, что ингредиенты рецепта создаются одним запросом'
+        )
+        recipe_id = response.json()['id']
+        assert len(response.json()['ingredients']) == len(ingredient_types)
+        assert [tag['id'] for tag in response.json()['tags']] == [tags[0].id], (
+            'Проверьте, что тэги рецепта сохраняются при создании'
+        )
+
+        shared_before = RecipeIngredient.objects.filter(recipe=recipes[0]).count()
+        data['ingredients'] = [{'id': ingredient_types[0].id, 'amount': 20}]
+        data['tags'] = [tags[1].id, tags[2].id]
+        response = admin_client.patch(f'{self.url}{recipe_id}/', data=data, format='json')
+        assert response.status_code == 200, (
+            f'Проверьте, что при PATCH запросе `{self.url}{{id}}/` возвращается статус 200'
+        )
+        assert sorted(tag['id'] for tag in response.json()['tags']) == [tags[1].id, tags[2].id], (
+            'Проверьте, что тэги рецепта обновляются'
+        )
+        assert response.json()['ingredients'] == [{
+            'id': ingredient_types[0].id,
+            'name': ingredient_types[0].name,
+            'measurement_unit': ingredient_types[0].measurement_unit,
+            'amount': 20,
+        }]
+        assert RecipeIngredient.objects.filter(recipe=recipes[0]).count() == shared_before, (
+            'Проверьте, что при обновлении рецепта не удаляются ингредиенты других рецептов'
+        )
+
+    @pytest.mark.django_db
+    def test_05_recipe_create_invalid_ingredients(
+        self, admin_client, tags, ingredient_types, media_root, image
+    ):
+        data = {
+            'name': 'Новый рецепт',
+            'text': 'Описание',
+            'cooking_time': 15,
+            'image': image,
+            'tags': [tags[0].id],
+            'ingredients': [
+                {'id': ingredient_types[0].id, 'amount': 10},
+                {'id': ingredient_types[0].id, 'amount': 20},
+            ],
+        }
+        response = admin_client.post(self.url, data=data, format='json')
+        assert response.status_code == 400, (
+            'Проверьте, что нельзя создать рецепт с повторяющимися ингредиентами'
+        )
+        data['ingredients'] = [{'id': 10 ** 6, 'amount': 10}]
+        response = admin_client.post(self.url, data=data, format='json')
+        assert response.status_code == 400, (
+            'Проверьте, что нельзя создать рецепт с несуществующим ингредиентом'
+        )
+
+    @pytest.mark.django_db
+    def test_06_recipe_counters(self, user_client, admin, recipes, media_root):
+        recipe = recipes[0]
+        response = user_client.post(f'{self.url}{recipe.id}/favorite/')
+        assert response.status_code == 201
+        recipe.refresh_from_db()
+        assert recipe.favorites_count == 1, (
+            'Проверьте, что добавление в избранное увеличивает `favorites_count`'
+        )
+        response = user_client.delete(f'{self.url}{recipe.id}/favorite/')
+        assert response.status_code == 200
+        recipe.refresh_from_db()
+        assert recipe.favorites_count == 0, (
+            'Проверьте, что удаление из избранного уменьшает `favorites_count`'
+        )
+        admin.refresh_from_db()
+        assert admin.recipes_count == len(recipes), (
+            'Проверьте, что создание рецепта увеличивает `recipes_count` автора'
+        )
+        recipe.delete()
+        admin.refresh_from_db()
+        assert admin.recipes_count == len(recipes) - 1, (
+            'Проверьте, что удаление рецепта уменьшает `recipes_count` автора'
+        )
+
+    @pytest.mark.django_db
+    def test_06_01_favorites_count_outside_api(self, user, admin, recipes):
+        first, second = recipes[0], recipes[1]
+        user.favorites.add(first, second)
+        first.favorited_by.add(admin)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        assert (first.favorites_count, second.favorites_count) == (2, 1), (
+            'Проверьте, что `favorites_count` меняется при добавлении '
+            'в избранное с любой стороны связи, а не только через API'
+        )
+        user.favorites.remove(second)
+        second.refresh_from_db()
+        assert second.favorites_count == 0, (
+            'Проверьте, что удаление из избранного уменьшает `favorites_count`'
+        )
+        user.favorites.clear()
+        first.refresh_from_db()
+        assert first.favorites_count == 1, (
+            'Проверьте, что очистка избранного пользователя уменьшает '
+            '`favorites_count` его рецептов'
+        )
+        first.favorited_by.clear()
+        first.refresh_from_db()
+        assert first.favorites_count == 0, (
+            'Проверьте, что очистка избранного рецепта обнуляет `favorites_count`'
+        )
+
+    @pytest.mark.django_db
+    def test_06_02_counters_after_user_delete(
+        self, user_client, user, admin, recipes, media_root
+    ):
+        from api.models import Recipe, User
+
+        user_client.post(f'/api/users/{admin.id}/subscribe/')
+        for recipe in recipes:
+            user_client.post(f'{self.url}{recipe.id}/favorite/')
+        admin.refresh_from_db()
+        assert admin.subscribers_count == 1
+        user.delete()
+        admin.refresh_from_db()
+        assert admin.subscribers_count == 0, (
+            'Проверьте, что `subscribers_count` уменьшается при каскадном '
+            'удалении подписки вместе с подписчиком'
+        )
+        assert not Recipe.objects.filter(favorites_count__gt=0).exists(), (
+            'Проверьте, что `favorites_count` уменьшается при каскадном '
+            'удалении избранного вместе с пользователем'
+        )
+        admin.delete()
+        default_user = User.objects.get(id=User.get_default_user())
+        assert default_user.recipes_count == len(recipes), (
+            'Проверьте, что `recipes_count` переходит пользователю по умолчанию '
+            'вместе с рецептами удаленного автора'
+        )
+
+    @pytest.mark.django_db
+    def test_07_recipes_cursor_pagination(self, client, recipes):
+        url = f'{self.url}?pagination=cursor&limit=3'
+        ids = []
+        while url:
+            response = client.get(url)
+            assert response.status_code == 200, (
+                f'Проверьте, что при GET запросе `{url}` возвращается статус 200'
+            )
+            data = response.json()
+            assert 'count' not in data, (
+                'Проверьте, что курсорная пагинация не считает общее количество'
+            )
+            assert len(data['results']) <= 3
+            ids.extend(recipe['id'] for recipe in data['results'])
+            url = data['next']
+        assert ids == sorted((recipe.id for recipe in recipes), reverse=True), (
+            'Проверьте, что курсорная пагинация возвращает все рецепты '
+            'по одному разу от новых к старым'
+        )
+
+    @pytest.mark.django_db
+    def test_08_recipes_count_cache(self, client, admin, recipes):
+        from api.models import Recipe
+
+        def count_queries_total(url):
+            with CaptureQueriesContext(connection) as context:
+                response = client.get(url)
+            assert response.status_code == 200
+            counts = [
+                query for query in context.captured_queries
+                if query['sql'].startswith('SELECT COUNT(*)')
+            ]
+            return response.json()['count'], len(counts)
+
+        url = f'{self.url}?tags=breakfast&tags=lunch'
+        count, queries = count_queries_total(url)
+        assert queries == 1
+        assert count_queries_total(url) == (count, 0), (
+            'Проверьте, что количество рецептов берется из кеша'
+        )
+        recipe = Recipe.objects.create(
+            name='Новый рецепт', text='Описание', cooking_time=10, author=admin
+        )
+        recipe.tags.add(recipes[0].tags.first())
+        assert count_queries_total(url) == (count + 1, 1), (
+            'Проверьте, что кеш количества сбрасывается при записи рецептов'
+        )
+
+    @pytest.mark.django_db
+    def test_08_01_recipes_count_cache_scope(self, user_client, user, recipes):
+        from django.utils import timezone
+
+        def count_queries_total(url):
+            with CaptureQueriesContext(connection) as context:
+                response = user_client.get(url)
+            assert response.status_code == 200
+            counts = [
+                query for query in context.captured_queries
+                if query['sql'].startswith('SELECT COUNT(*)')
+            ]
+            return response.json()['count'], len(counts)
+
+        cache.clear()
+        url = f'{self.url}?tags=breakfast&tags=lunch'
+        favorited_url = f'{self.url}?is_favorited=1'
+        count, _ = count_queries_total(url)
+        favorited, _ = count_queries_total(favorited_url)
+        user_client.post(f'{self.url}{recipes[1].id}/favorite/')
+        assert count_queries_total(url) == (count, 0), (
+            'Проверьте, что добавление в избранное не сбрасывает '
+            'кеш количества общего списка рецептов'
+        )
+        assert count_queries_total(favorited_url) == (favorited + 1, 1), (
+            'Проверьте, что кеш количества с фильтром `is_favorited` '
+            'сбрасывается при изменении избранного пользователя'
+        )
+        user.last_login = timezone.now()
+        user.save(update_fields=['last_login'])
+        assert count_queries_total(url) == (count, 0), (
+            'Проверьте, что сохранение пользователя не сбрасывает '
+            'кеш количества рецептов'
+        )
+
+    @pytest.mark.django_db
+    def test_09_recipes_tags_filter(self, client, tags, recipes):
+        recipes[0].tags.add(tags[1])
+        response = client.get(f'{self.url}?tags=breakfast&tags=lunch&limit=10')
+        expected = {
+            recipe.id for recipe in recipes
+            if {'breakfast', 'lunch'} & {tag.slug for tag in recipe.tags.all()}
+        }
+        ids = [recipe['id'] for recipe in response.json()['results']]
+        assert len(ids) == len(set(ids)) and set(ids) == expected, (
+            'Проверьте, что фильтр по тэгам возвращает рецепты с любым из тэгов '
+            'без повторов'
+        )
+        response = client.get(f'{self.url}?tags=breakfast&tags=lunch&tags_match=all')
+        ids = [recipe['id'] for recipe in response.json()['results']]
+        assert ids == [recipes[0].id], (
+            'Проверьте, что с параметром `tags_match=all` возвращаются рецепты '
+            'со всеми тэгами'
+        )
+        response = client.get(f'{self.url}?tags=breakfast&tags=unknown&tags_match=all')
+        assert response.json()['results'] == []
+
+    @pytest.mark.django_db
+    def test_10_recipes_tag_counts(self, user_client, user, tags, recipes):
+        recipes[0].tags.add(tags[1])
+        recipes[0].favorited_by.add(user)
+        queries = count_queries(user_client, f'{self.url}?tags=breakfast')
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.get(f'{self.url}?tags=breakfast&tag_counts=1')
+        assert len(context.captured_queries) == queries + 1, (
+            'Проверьте, что количество рецептов по тэгам считается одним запросом'
+        )
+        counts = {item['slug']: item['recipes_count'] for item in response.json()['tag_counts']}
+        assert counts == {'breakfast': 3, 'lunch': 4, 'supper': 2}, (
+            'Проверьте, что в режиме "любой из тэгов" выбранные тэги '
+            'не сужают подсчет'
+        )
+        response = user_client.get(
+            f'{self.url}?tags=breakfast&tags_match=all&is_favorited=1&tag_counts=1'
+        )
+        counts = {item['slug']: item['recipes_count'] for item in response.json()['tag_counts']}
+        assert counts == {'breakfast': 1, 'lunch': 1, 'supper': 0}, (
+            'Проверьте, что счетчики тэгов учитывают остальные фильтры'
+        )
+
+    @pytest.mark.django_db
+    def test_11_recipes_name_filter(self, client, admin, recipes):
+        from api.models import Recipe
+        Recipe.objects.create(
+            name='Ёжики из фарша', text='Описание', cooking_time=10, author=admin
+        )
+        Recipe.objects.create(
+            name='Мясные ежики', text='Описание', cooking_time=10, author=admin
+        )
+        response = client.get(f'{self.url}?name=ЕЖИК')
+        names = [recipe['name'] for recipe in response.json()['results']]
+        assert names == ['Ёжики из фарша', 'Мясные ежики'], (
+            'Проверьте, что поиск рецептов по названию не учитывает регистр '
+            'и различие "ё" и "е", а совпадения по началу названия идут первыми'
+        )
+        recipe = Recipe.objects.get(name='Мясные ежики')
+        recipe.name = 'Мясные тефтели'
+        recipe.save(update_fields=['name'])
+        response = client.get(f'{self.url}?name=ежик')
+        assert response.json()['count'] == 1, (
+            'Проверьте, что поле поиска обновляется при сохранении рецепта'
+        )
+
+    @pytest.mark.django_db
+    def test_12_recipes_full_text_search(self, client, admin, recipes, media_root):
+        from api.models import Recipe
+        soup = Recipe.objects.create(
+            name='Щи', text='Капуста, морковь и картофель', cooking_time=10,
+            author=admin
+        )
+        pie = Recipe.objects.create(
+            name='Капустный пирог', text='Тесто и начинка', cooking_time=10,
+            author=admin
+        )
+        response = client.get(f'{self.url}?search=капуст')
+        ids = [recipe['id'] for recipe in response.json()['results']]
+        assert ids == [pie.id, soup.id], (
+            'Проверьте, что поиск `search` ищет по названию и описанию рецепта, '
+            'а совпадения в названии релевантнее'
+        )
+        response = client.get(f'{self.url}?search=МОРКОВЬ картофель')
+        assert [recipe['id'] for recipe in response.json()['results']] == [soup.id]
+        soup.text = 'Квашеная капуста'
+        soup.save()
+        response = client.get(f'{self.url}?search=морковь')
+        assert response.json()['results'] == [], (
+            'Проверьте, что индекс поиска обновляется при изменении рецепта'
+        )
+        pie.delete()
+        response = client.get(f'{self.url}?search=пирог')
+        assert response.json()['results'] == [], (
+            'Проверьте, что индекс поиска обновляется при удалении рецепта'
+        )
+
+    @pytest.mark.django_db
+    def test_12_01_recipes_full_text_search_subquery(self):
+        from api.models import Recipe
+        from api.utils.search import postgres_full_text_search
+        recipes = postgres_full_text_search(Recipe.objects.all(), 'суп')
+        sql = str(Recipe.objects.filter(pk__in=recipes.order_by().values('pk')).query)
+        subquery = sql[sql.index('(SELECT'):]
+        assert '"api_recipe"."name"' not in subquery and 'U0."name"' in subquery, (
+            'Проверьте, что условие полнотекстового поиска PostgreSQL '
+            'переименовывает таблицу в подзапросе'
+        )
+
+    @pytest.mark.django_db
+    def test_13_recipes_cook(
+        self, admin_client, tags, ingredient_types, recipes, media_root, image
+    ):
+        from api.models import Recipe
+
+        def create_recipe(ingredients):
+            data = {
+                'name': 'Новый рецепт',
+                'text': 'Описание',
+                'cooking_time': 15,
+                'image': image,
+                'tags': [tags[0].id],
+                'ingredients': [
+                    {'id': ingredient_type.id, 'amount': 10}
+                    for ingredient_type in ingredients
+                ],
+            }
+            return admin_client.post(self.url, data=data, format='json').json()
+
+        first, second, *_, last = ingredient_types
+        small = create_recipe(ingredient_types[:2])
+        large = create_recipe(ingredient_types[:4])
+        url = f'{self.url}cook/?ingredients={first.id},{second.id}'
+        response = admin_client.get(url)
+        assert response.status_code == 200, (
+            f'Проверьте, что GET запрос `{self.url}cook/` возвращает статус 200'
+        )
+        ids = [recipe['id'] for recipe in response.json()['results']]
+        assert ids[:2] == [small['id'], large['id']], (
+            'Проверьте, что рецепты упорядочены по доле имеющихся ингредиентов'
+        )
+        assert response.json()['count'] == len(recipes) + 2
+        response = admin_client.get(f'{url}&exclude={last.id}')
+        ids = [recipe['id'] for recipe in response.json()['results']]
+        assert ids == [small['id'], large['id']], (
+            'Проверьте, что рецепты с исключенными ингредиентами не возвращаются'
+        )
+        admin_client.patch(
+            f'{self.url}{large["id"]}/',
+            data={
+                'ingredients': [
+                    {'id': first.id, 'amount': 10}, {'id': second.id, 'amount': 10}
+                ],
+                'tags': [tags[0].id],
+                'image': image,
+                'name': 'Новый рецепт',
+                'text': 'Описание',
+                'cooking_time': 15,
+            },
+            format='json',
+        )
+        response = admin_client.get(f'{url}&exclude={last.id}')
+        ids = [recipe['id'] for recipe in response.json()['results']]
+        assert ids == [large['id'], small['id']], (
+            'Проверьте, что количество ингредиентов рецепта '
+            'обновляется при изменении рецепта'
+        )
+        Recipe.objects.filter(id=small['id']).update(ingredients_count=0)
+        response = admin_client.get(f'{url}&exclude={last.id}')
+        assert response.status_code == 200, (
+            'Проверьте, что рецепт с нулевым `ingredients_count` '
+            'не приводит к делению на ноль'
+        )
+        ids = [recipe['id'] for recipe in response.json()['results']]
+        assert ids == [large['id'], small['id']]
+        sql = str(Recipe.objects.cookable_from([first.id]).query)
+        assert 'NULLIF' in sql, (
+            'Проверьте, что знаменатель `coverage` защищен от деления на ноль'
+        )
+        response = admin_client.get(f'{self.url}cook/?ingredients=abc')
+        assert response.status_code == 400
+
+    @pytest.mark.django_db
+    def test_14_recipes_similar(
+        self, client, admin_client, tags, ingredient_types, media_root, image
+    ):
+        from api.models import IngredientType
+
+        def create_recipe(ingredients):
+            data = {
+                'name': 'Новый рецепт',
+                'text': 'Описание',
+                'cooking_time': 15,
+                'image': image,
+                'tags': [tags[0].id],
+                'ingredients': [
+                    {'id': ingredient_type.id, 'amount': 10}
+                    for ingredient_type in ingredients
+                ],
+            }
+            return admin_client.post(self.url, data=data, format='json').json()['id']
+
+        other_types = [
+            IngredientType.objects.create(name=f'Другой ингредиент {i}', measurement_unit='г')
+            for i in range(5)
+        ]
+        target = create_recipe(ingredient_types)
+        close = create_recipe(ingredient_types[:4] + other_types[:1])
+        far = create_recipe(ingredient_types[:2] + other_types[:3])
+        unrelated = create_recipe(other_types)
+        response = client.get(f'{self.url}{target}/similar/')
+        assert response.status_code == 200, (
+            f'Проверьте, что GET запрос `{self.url}{{id}}/similar/` возвращает статус 200'
+        )
+        ids = [recipe['id'] for recipe in response.json()]
+        assert ids[0] == close and target not in ids and unrelated not in ids, (
+            'Проверьте, что похожие рецепты упорядочены по похожести состава '
+            'и не включают сам рецепт и рецепты без общих ингредиентов'
+        )
+        admin_client.patch(
+            f'{self.url}{far}/',
+            data={
+                'ingredients': [
+                    {'id': ingredient_type.id, 'amount': 10}
+                    for ingredient_type in ingredient_types
+                ],
+                'tags': [tags[0].id],
+                'image': image,
+                'name': 'Новый рецепт',
+                'text': 'Описание',
+                'cooking_time': 15,
+            },
+            format='json',
+        )
+        response = client.get(f'{self.url}{target}/similar/?limit=1')
+        assert [recipe['id'] for recipe in response.json()] == [far], (
+            'Проверьте, что индекс похожих рецептов обновляется '
+            'при изменении ингредиентов рецепта и учитывается параметр `limit`'
+        )
+
+    @pytest.mark.django_db
+    def test_15_recipes_popular(self, user_client, admin_client, user, recipes):
+        from datetime import timedelta
+
+        from django.apps import apps
+        from django.utils import timezone
+
+        from api.models import RecipeActivity, RecipePopularity
+        from api.utils.popularity import update_popularity
+
+        for client in (user_client, admin_client):
+            client.post(f'{self.url}{recipes[0].id}/favorite/')
+            client.post(f'{self.url}{recipes[1].id}/shopping_cart/')
+        user_client.post(f'{self.url}{recipes[2].id}/favorite/')
+        assert RecipeActivity.objects.count() == 5, (
+            'Проверьте, что добавление в избранное и корзину записывается '
+            'в журнал событий популярности'
+        )
+        for _ in range(3):
+            user_client.delete(f'{self.url}{recipes[2].id}/favorite/')
+            user_client.post(f'{self.url}{recipes[2].id}/favorite/')
+        assert RecipeActivity.objects.count() == 5, (
+            'Проверьте, что повторное добавление в избранное тем же '
+            'пользователем не записывается до пересчета рейтинга'
+        )
+        response = user_client.get(f'{self.url}popular/')
+        assert response.json()['results'] == [], (
+            'Проверьте, что рейтинг популярности не считается на лету'
+        )
+        assert update_popularity(apps) == 5
+        assert not RecipeActivity.objects.exists(), (
+            'Проверьте, что учтенные события удаляются из журнала'
+        )
+        response = user_client.get(f'{self.url}popular/?limit=2')
+        assert response.status_code == 200
+        ids = [recipe['id'] for recipe in response.json()['results']]
+        assert ids == [recipes[0].id, recipes[2].id], (
+            'Проверьте, что рецепты упорядочены по популярности'
+        )
+        next_url = response.json()['next']
+        response = user_client.get(next_url)
+        assert [recipe['id'] for recipe in response.json()['results']] == [recipes[1].id], (
+            'Проверьте, что рейтинг популярности поддерживает курсорную пагинацию'
+        )
+        response = user_client.get(f'{self.url}popular/?tags={recipes[1].tags.get().slug}')
+        assert [recipe['id'] for recipe in response.json()['results']] == [recipes[1].id], (
+            'Проверьте, что рейтинг популярности фильтруется по тэгам'
+        )
+
+        later = timezone.now() + timedelta(days=7)
+        recipes[3].favorited_by.add(user)
+        assert RecipeActivity.objects.filter(recipe=recipes[3], user=user).exists(), (
+            'Проверьте, что добавление в избранное вне API тоже записывается '
+            'в журнал событий популярности'
+        )
+        update_popularity(apps, now=later)
+        scores = dict(RecipePopularity.objects.values_list('recipe_id', 'score'))
+        assert scores[recipes[0].id] == pytest.approx(1.0, rel=1e-3), (
+            'Проверьте, что популярность затухает вдвое за период полураспада'
+        )
+        assert scores[recipes[3].id] == pytest.approx(0.5, rel=1e-3), (
+            'Проверьте, что вес нового события затухает от времени события'
+        )
+        response = user_client.get(next_url)
+        assert response.status_code == 404, (
+            'Проверьте, что курсор от прежней версии рейтинга отклоняется'
+        )
+        response = user_client.get(f'{self.url}popular/?limit=2')
+        response = user_client.get(response.json()['next'])
+        assert response.status_code == 200, (
+            'Проверьте, что курсор от текущей версии рейтинга принимается'
+        )
+
+    @pytest.mark.django_db
+    def test_16_recipes_cart_items(
+        self, user_client, user, admin_client, tags, ingredient_types, recipes,
+        media_root, image
+    ):
+        from api.models import CartItem
+
+        def cart():
+            return dict(
+                CartItem.objects.filter(user=user).values_list('ingredient_type_id', 'total')
+            )
+
+        user_client.post(f'{self.url}{recipes[0].id}/shopping_cart/')
+        user_client.post(f'{self.url}{recipes[1].id}/shopping_cart/')
+        assert cart() == {
+            ingredient_type.id: number * 20
+            for number, ingredient_type in enumerate(ingredient_types, start=1)
+        }, 'Проверьте, что итоговая корзина обновляется при добавлении рецепта'
+        user_client.delete(f'{self.url}{recipes[0].id}/shopping_cart/')
+        assert cart() == {
+            ingredient_type.id: number * 10
+            for number, ingredient_type in enumerate(ingredient_types, start=1)
+        }, 'Проверьте, что итоговая корзина обновляется при удалении рецепта из корзины'
+
+        admin_client.patch(
+            f'{self.url}{recipes[1].id}/',
+            data={
+                'ingredients': [{'id': ingredient_types[0].id, 'amount': 7}],
+                'tags': [tags[0].id],
+                'image': image,
+                'name': 'Новый рецепт',
+                'text': 'Описание',
+                'cooking_time': 15,
+            },
+            format='json',
+        )
+        assert cart() == {ingredient_types[0].id: 7}, (
+            'Проверьте, что итоговая корзина пересчитывается при изменении рецепта'
+        )
+        with CaptureQueriesContext(connection) as context:
+            response = user_client.get(f'{self.url}download_shopping_cart/')
+        assert response.status_code == 200
+        cart_queries = [
+            query for query in context.captured_queries if 'api_cartitem' in query['sql']
+        ]
+        assert len(cart_queries) == 1 and 'api_recipeingredient' not in cart_queries[0]['sql'], (
+            'Проверьте, что список покупок читается из итоговой корзины одним запросом'
+        )
+        recipes[1].delete()
+        assert cart() == {}, (
+            'Проверьте, что итоговая корзина обновляется при удалении рецепта'
+        )
+
+    @pytest.mark.django_db
+    def test_17_recipes_shopping_cart_pdf_cache(
+        self, user_client, recipes, monkeypatch
+    ):
+        from xhtml2pdf import pisa
+
+        calls = []
+        create_pdf = pisa.CreatePDF
+
+        def counting_create_pdf(*args, **kwargs):
+            calls.append(1)
+            return create_pdf(*args, **kwargs)
+
+        monkeypatch.setattr(pisa, 'CreatePDF', counting_create_pdf)
+        url = f'{self.url}download_shopping_cart/'
+        user_client.post(f'{self.url}{recipes[0].id}/shopping_cart/')
+        first = user_client.get(url)
+        second = user_client.get(url)
+        assert first.status_code == second.status_code == 200
+        assert first.content == second.content and first.content.startswith(b'%PDF'), (
+            'Проверьте, что повторная загрузка возвращает тот же PDF'
+        )
+        assert len(calls) == 1, (
+            'Проверьте, что PDF для неизменной корзины берется из кеша'
+        )
+        user_client.post(f'{self.url}{recipes[1].id}/shopping_cart/')
+        user_client.get(url)
+        assert len(calls) == 2, (
+            'Проверьте, что после изменения корзины PDF формируется заново'
+        )
+
+    @pytest.mark.django_db
+    def test_18_recipes_shopping_cart_canvas_pdf(
+        self, user_client, recipes, settings, monkeypatch
+    ):
+        from xhtml2pdf import pisa
+
+        calls = []
+        monkeypatch.setattr(pisa, 'CreatePDF', lambda *args, **kwargs: calls.append(1))
+        settings.PDF_RENDERER = 'canvas'
+        user_client.post(f'{self.url}{recipes[0].id}/shopping_cart/')
+        response = user_client.get(f'{self.url}download_shopping_cart/')
+        assert response.status_code == 200
+        assert response.content.startswith(b'%PDF') and not calls, (
+            'Проверьте, что при PDF_RENDERER = "canvas" PDF формируется без xhtml2pdf'
+        )
+        assert b'FreeSans' in response.content, (
+            'Проверьте, что в PDF встроен шрифт с кириллицей'
+        )
+
+    def test_18_01_canvas_pdf_header_on_every_column(self, monkeypatch):
+        from reportlab.pdfgen.canvas import Canvas
+
+        from api.utils import pdf_canvas
+
+        strings = []
+        draw_string = Canvas.drawString
+
+        def recording_draw_string(self, x, y, text, *args, **kwargs):
+            strings.append(text)
+            draw_string(self, x, y, text, *args, **kwargs)
+
+        monkeypatch.setattr(Canvas, 'drawString', recording_draw_string)
+        pdf_canvas.render_shopping_list({
+            'username': 'user',
+            'list': {f'Ингредиент {number}': '1 г' for number in range(100)},
+        })
+        assert strings.count(pdf_canvas.HEADER[0]) == 3, (
+            'Проверьте, что шапка таблицы повторяется в начале каждой '
+            'колонки и страницы'
+        )
+
+    @pytest.mark.django_db
+    def test_19_recipes_pdf_rendering_context(self, user_client, recipes, monkeypatch):
+        from reportlab.pdfbase.ttfonts import TTFont
+
+        from api.utils import pdf_generator
+
+        pdf_generator.rendering_context.warm_up()
+        calls = []
+        init = TTFont.__init__
+
+        def counting_init(self, *args, **kwargs):
+            calls.append(1)
+            init(self, *args, **kwargs)
+
+        monkeypatch.setattr(TTFont, '__init__', counting_init)
+        monkeypatch.setattr(
+            pdf_generator, 'get_template',
+            lambda *args: pytest.fail('Шаблон должен браться из контекста рендера')
+        )
+        user_client.post(f'{self.url}{recipes[0].id}/shopping_cart/')
+        response = user_client.get(f'{self.url}download_shopping_cart/')
+        assert response.status_code == 200 and response.content.startswith(b'%PDF')
+        assert b'FreeSans' in response.content, (
+            'Проверьте, что в PDF встроен шрифт с кириллицей'
+        )
+        assert not calls, (
+            'Проверьте, что шрифт разбирается один раз на процесс, а не при каждом рендере'
+        )
+
+    @pytest.mark.django_db
+    def test_20_recipes_shopping_cart_formats(self, user_client, client, recipes, ingredient_types):
+        import csv
+        import json
+
+        url = f'{self.url}download_shopping_cart/'
+        user_client.post(f'{self.url}{recipes[0].id}/shopping_cart/')
+        expected = sorted(
+            (ingredient_type.name, ingredient_type.measurement_unit, number * 10)
+            for number, ingredient_type in enumerate(ingredient_types, start=1)
+        )
+
+        response = user_client.get(f'{url}?format=json')
+        assert response.status_code == 200 and response.streaming, (
+            'Проверьте, что список покупок в JSON отдается потоком'
+        )
+        assert response['Content-Type'].startswith('application/json')
+        data = json.loads(b''.join(response.streaming_content))
+        assert data['username'] == 'TestUser'
+        assert [
+            (item['name'], item['measurement_unit'], item['amount'])
+            for item in data['ingredients']
+        ] == expected, 'Проверьте содержимое списка покупок в JSON'
+
+        response = user_client.get(url, HTTP_ACCEPT='text/csv')
+        assert response.status_code == 200 and response['Content-Type'].startswith('text/csv'), (
+            'Проверьте, что формат выбирается заголовком Accept'
+        )
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        rows = list(csv.reader(lines))
+        assert rows[0] == ['Ингредиент', 'Количество', 'Единица']
+        assert [(name, unit, int(amount)) for name, amount, unit in rows[1:]] == expected
+
+        response = user_client.get(f'{url}?format=txt')
+        assert response['Content-Type'].startswith('text/plain')
+        text = b''.join(response.streaming_content).decode()
+        assert f'{expected[0][0]} - {expected[0][2]} {expected[0][1]}' in text
+
+        response = user_client.get(url)
+        assert response.content.startswith(b'%PDF'), (
+            'Проверьте, что по умолчанию список покупок отдается в PDF'
+        )
+        response = client.get(url)
+        assert response.status_code == 401 and response.json()['detail'], (
+            'Проверьте, что ошибки загрузки списка покупок отдаются в JSON'
+        )
+
+    @pytest.mark.django_db
+    def test_21_recipe_admin_inlines(
+        self, client, user, user_client, django_user_model, tags, ingredient_types,
+        recipes, media_root
+    ):
+        from api.models import CartItem, RecipeSignature
+        from api.utils.minhash import signature, unpack
+        superuser = django_user_model.objects.create_superuser(
+            username='root', email='root@hello.py', password='1234567'
+        )
+        client.force_login(superuser)
+        recipe = recipes[0]
+        user_client.post(f'{self.url}{recipe.id}/shopping_cart/')
+        ingredients = list(recipe.recipe_ingredients.order_by('id'))
+        data = {
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'author': recipe.author_id,
+            'added_to_cart': [user.id],
+            'favorited_by': [user.id],
+            'recipe_ingredients-TOTAL_FORMS': len(ingredients) + 1,
+            'recipe_ingredients-INITIAL_FORMS': len(ingredients),
+            'recipe_tags-TOTAL_FORMS': 1,
+            'recipe_tags-INITIAL_FORMS': 0,
+            'recipe_tags-0-tag': tags[1].id,
+        }
+        for number, item in enumerate(ingredients):
+            data.update({
+                f'recipe_ingredients-{number}-id': item.id,
+                f'recipe_ingredients-{number}-recipe': recipe.id,
+                f'recipe_ingredients-{number}-ingredient_type': item.ingredient_type_id,
+                f'recipe_ingredients-{number}-amount': item.amount,
+            })
+        # первый ингредиент удаляем, количество второго меняем
+        data['recipe_ingredients-0-DELETE'] = 'on'
+        data['recipe_ingredients-1-amount'] = 5
+        response = client.post(f'/admin/api/recipe/{recipe.id}/change/', data)
+        assert response.status_code == 302, (
+            'Проверьте, что рецепт сохраняется через админку'
+        )
+        recipe.refresh_from_db()
+        assert set(recipe.tags.all()) == {tags[0], tags[1]}, (
+            'Проверьте, что тэги рецепта редактируются в админке'
+        )
+        assert recipe.ingredients_count == len(ingredient_types) - 1, (
+            'Проверьте, что админка пересчитывает `ingredients_count`'
+        )
+        ingredient_ids = [item.ingredient_type_id for item in ingredients[1:]]
+        assert unpack(RecipeSignature.objects.get(recipe=recipe).minhash) == signature(
+            ingredient_ids
+        ), 'Проверьте, что админка пересчитывает MinHash сигнатуру рецепта'
+        assert dict(
+            CartItem.objects.filter(user=user).values_list('ingredient_type_id', 'total')
+        ) == {
+            item.ingredient_type_id: 5 if number == 1 else item.amount
+            for number, item in enumerate(ingredients) if number
+        }, 'Проверьте, что админка пересчитывает итоговые корзины'
@@ -0,0 +1,134 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def create_authors(django_user_model, subscriber, total, recipes_per_author):
+    from api.models import Recipe, Subscription
+    authors = []
+    for i in range(total):
+        author = django_user_model.objects.create_user(
+            username=f'author_{i}', email=f'author_{i}@hello.py', password='1234567'
+        )
+        Subscription.objects.create(subscriber=subscriber, subscribed_to=author)
+        for j in range(recipes_per_author):
+            Recipe.objects.create(
+                name=f'Рецепт {i}-{j}', text='Описание', cooking_time=10, author=author
+            )
+        authors.append(author)
+    return authors
+
+
+class TestSubscriptionApi:
+    url = '/api/users/subscriptions/'
+
+    @pytest.mark.django_db
+    def test_00_subscriptions_recipes_limit(self, user_client, user, django_user_model):
+        create_authors(django_user_model, user, total=2, recipes_per_author=4)
+        response = user_client.get(f'{self.url}?recipes_limit=3')
+        assert response.status_code == 200, (
+            f'Проверьте, что при GET запросе `{self.url}` возвращается статус 200'
+        )
+        for author in response.json()['results']:
+            assert author['is_subscribed'] is True
+            assert author['recipes_count'] == 4, (
+                'Проверьте, что `recipes_count` содержит общее число рецептов автора'
+            )
+            assert len(author['recipes']) == 3, (
+                'Проверьте, что количество рецептов ограничено `recipes_limit`'
+            )
+            ids = [recipe['id'] for recipe in author['recipes']]
+            assert ids == sorted(ids, reverse=True), (
+                'Проверьте, что рецепты автора идут от новых к старым'
+            )
+
+    @pytest.mark.django_db
+    def test_01_subscriptions_queries(self, user_client, user, django_user_model):
+        create_authors(django_user_model, user, total=6, recipes_per_author=2)
+        queries = []
+        for limit in (1, 6):
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                response = user_client.get(f'{self.url}?limit={limit}')
+            assert response.status_code == 200
+            queries.append(len(context.captured_queries))
+        assert queries[0] == queries[1], (
+            'Проверьте, что число запросов к БД не зависит от числа авторов на странице'
+        )
+
+    @pytest.mark.django_db
+    def test_02_subscribers_count(self, user_client, admin):
+        response = user_client.post(f'/api/users/{admin.id}/subscribe/')
+        assert response.status_code == 201
+        admin.refresh_from_db()
+        assert admin.subscribers_count == 1, (
+            'Проверьте, что подписка увеличивает `subscribers_count` автора'
+        )
+        response = user_client.delete(f'/api/users/{admin.id}/subscribe/')
+        assert response.status_code == 200
+        admin.refresh_from_db()
+        assert admin.subscribers_count == 0, (
+            'Проверьте, что отписка уменьшает `subscribers_count` автора'
+        )
+
+    @pytest.mark.django_db
+    def test_03_subscriptions_feed(
+        self, user_client, admin_client, user, admin, django_user_model, settings
+    ):
+        from api.models import FeedEntry, Recipe
+        feed_url = '/api/recipes/feed/'
+        first, second = create_authors(django_user_model, user, total=2, recipes_per_author=3)
+        Recipe.objects.create(name='Чужой рецепт', text='Описание', cooking_time=10, author=admin)
+        expected = list(
+            Recipe.objects.filter(author__in=[first, second]).values_list('id', flat=True)
+        )
+        response = user_client.get(f'{feed_url}?limit=4')
+        assert response.status_code == 200, (
+            f'Проверьте, что при GET запросе `{feed_url}` возвращается статус 200'
+        )
+        ids = [recipe['id'] for recipe in response.json()['results']]
+        response = user_client.get(response.json()['next'])
+        ids += [recipe['id'] for recipe in response.json()['results']]
+        assert ids == expected, (
+            'Проверьте, что лента содержит новые рецепты авторов из подписок '
+            'и поддерживает курсорную пагинацию'
+        )
+
+        settings.FEED_FANOUT_LIMIT = 1
+        django_user_model.objects.filter(pk=second.pk).update(subscribers_count=1)
+        admin_client.post(f'/api/users/{second.id}/subscribe/')
+        entries = FeedEntry.objects.count()
+        recipe = Recipe.objects.create(
+            name='Новый рецепт', text='Описание', cooking_time=10, author=second
+        )
+        assert FeedEntry.objects.count() == entries, (
+            'Проверьте, что рецепты авторов с большим числом подписчиков '
+            'не раскладываются по лентам'
+        )
+        response = user_client.get(feed_url)
+        assert response.json()['results'][0]['id'] == recipe.id, (
+            'Проверьте, что рецепты авторов с большим числом подписчиков '
+            'подмешиваются в ленту при чтении'
+        )
+        admin_client.delete(f'/api/users/{second.id}/subscribe/')
+        assert FeedEntry.objects.filter(user=user, recipe=recipe).exists(), (
+            'Проверьте, что когда рецепты автора снова раскладываются по лентам, '
+            'ленты подписчиков дополняются'
+        )
+
+        user_client.delete(f'/api/users/{first.id}/subscribe/')
+        response = user_client.get(feed_url)
+        authors = {recipe['author']['id'] for recipe in response.json()['results']}
+        assert authors == {second.id}, (
+            'Проверьте, что после отписки рецепты автора пропадают из ленты'
+        )
+        user_client.post(f'/api/users/{first.id}/subscribe/')
+        response = user_client.get(f'{feed_url}?limit=10')
+        assert len(response.json()['results']) == 7, (
+            'Проверьте, что при подписке последние рецепты автора '
+            'добавляются в ленту'
+        )
+        assert user_client.get(feed_url).status_code == 200
+        from rest_framework.test import APIClient
+        assert APIClient().get(feed_url).status_code == 401
@@ -89,6 +89,27 @@ class Test01UserAPI:
         )
 
 
+    @pytest.mark.django_db(transaction=True)
+    def test_05_users_is_subscribed(self, admin_client, admin):
+        from api.models import Subscription
+        user_1, user_2 = create_users_api(admin_client)
+        Subscription.objects.create(subscriber=admin, subscribed_to=user_1)
+        response = admin_client.get(self.users_url)
+        results = {item['id']: item for item in response.json()['results']}
+        assert results[user_1.id]['is_subscribed'] is True, (
+            f'Проверьте, что при GET запросе `{self.users_url}` поле `is_subscribed` '
+            'равно True для пользователей, на которых есть подписка'
+        )
+        assert results[user_2.id]['is_subscribed'] is False, (
+            f'Проверьте, что при GET запросе `{self.users_url}` поле `is_subscribed` '
+            'равно False для пользователей, на которых нет подписки'
+        )
+        response = admin_client.get(f'{self.users_url}{user_1.id}/')
+        assert response.json()['is_subscribed'] is True, (
+            f'Проверьте, что при GET запросе `{self.users_url}{{id}}/` '
+            'поле `is_subscribed` заполнено верно'
+        )
+
     @pytest.mark.django_db(transaction=True)
     def test_07_01_users_username_patch_admin(self, admin_client, admin, user):
         user_1, user_2 = create_users_api(admin_client)